@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+import time
+
+
+class AdaptiveMotionControl:
+    """
+    Per-camera MOG2 subtractor whose parameters follow the scene's light and noise.
+
+    `observe` is fed every analysed frame (with its grayscale thumbnail from
+    `frame_changed`) and tracks:
+      * global brightness (EMA) - a jump means lights on/off or IR cut filter switching
+      * IR mode - frames with no colour saturation
+      * temporal noise - median thumbnail difference, which rises with sensor gain at night
+
+    From these it sets `varThreshold` on the subtractor, the learning rate to pass
+    to `apply` (half of MOG2's default 1 / history at night, so slow noise isn't
+    absorbed into the background), the minimum blob area, and `suppressed` while the
+    background is being re-learnt after an illumination jump so those frames never
+    trigger detection. Dropped triggers are counted in `suppressed_triggers`.
+    """
+
+    def __init__(self, history=100, var_threshold=16, min_area=1000,
+                 jump_threshold=25, suppress_seconds=3, night_brightness=50):
+        self.backSub = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold, detectShadows=False)
+        self.night_learning_rate = 0.5 / history
+        self.base_var_threshold = var_threshold
+        self.base_min_area = min_area
+        self.jump_threshold = jump_threshold
+        self.suppress_seconds = suppress_seconds
+        self.night_brightness = night_brightness
+
+        self.brightness = None
+        self.noise = 0.0
+        self.ir_mode = False
+        self.previous = None
+        self.suppressed_until = 0
+        self.suppressed_triggers = 0
+
+        self.var_threshold = var_threshold
+        self.learning_rate = -1  # -1 lets MOG2 use 1 / history
+        self.min_area = min_area
+
+    @property
+    def suppressed(self):
+        return time.time() < self.suppressed_until
+
+    @property
+    def night(self):
+        return self.ir_mode or (self.brightness is not None and self.brightness < self.night_brightness)
+
+    def observe(self, frame, thumbnail):
+        brightness = float(thumbnail.mean())
+        tiny = cv2.resize(frame, (16, 12), interpolation=cv2.INTER_AREA).astype(np.int16)
+        ir_mode = float(np.abs(tiny - tiny.mean(axis=2, keepdims=True)).mean()) < 2.0
+
+        first = self.brightness is None
+        jumped = not first and (ir_mode != self.ir_mode or abs(brightness - self.brightness) > self.jump_threshold)
+        self.ir_mode = ir_mode
+        if self.previous is not None and self.previous.shape == thumbnail.shape:
+            frame_noise = float(np.median(cv2.absdiff(thumbnail, self.previous)))
+            self.noise = 0.9 * self.noise + 0.1 * frame_noise
+        self.previous = thumbnail
+
+        if first or jumped:
+            # Illumination jump: follow the new level at once and re-learn the background fast
+            self.brightness = brightness
+            if jumped:
+                self.suppressed_until = time.time() + self.suppress_seconds
+        else:
+            self.brightness = 0.95 * self.brightness + 0.05 * brightness
+
+        self._tune()
+
+    def _tune(self):
+        if self.suppressed:
+            self.learning_rate = 0.5
+        elif self.night:
+            self.learning_rate = self.night_learning_rate
+        else:
+            self.learning_rate = -1
+
+        # Raise the variance threshold with sensor noise (it is a squared distance)
+        var_threshold = self.base_var_threshold * max(1.0, (self.noise / 2.0) ** 2)
+        if self.night:
+            var_threshold *= 2
+        var_threshold = float(np.clip(var_threshold, self.base_var_threshold, 100))
+        if abs(var_threshold - self.var_threshold) >= 1:
+            self.var_threshold = var_threshold
+            self.backSub.setVarThreshold(var_threshold)
+
+        self.min_area = int(self.base_min_area * (1.5 if self.night else 1))
+
+    def gate(self, has_motion):
+        """Drop a motion trigger raised while the background is re-learning."""
+        if has_motion and self.suppressed:
+            self.suppressed_triggers += 1
+            return False
+        return has_motion
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import threading
+import cv2
+
+
+class DiskAlertQueue:
+    """
+    Alert queue spooled to disk so alerts survive crashes and channel outages.
+
+    Every alert is stored as `<seq>.jpg` (the snapshot) plus `<seq>.json` (timestamp,
+    camera info, recipients, attempts), both written to a temp name and renamed, so a
+    crash never leaves a half-written entry. Only the sequence numbers of pending
+    entries are kept in memory; the frame is re-read from the JPEG when it is sent.
+
+    `get` hands out the oldest entry that is due, `ack` deletes it, and `nack` schedules
+    a retry with exponential backoff (after `max_attempts` the entry is moved to
+    `failed/`). Entries left over from a previous run are replayed on start.
+    `put` blocks while `max_pending` entries are waiting and gives up after `put_timeout`.
+    """
+
+    def __init__(self, directory, max_pending=200, max_attempts=8, retry_delay=10,
+                 max_retry_delay=600, jpeg_quality=90, put_timeout=5):
+        self.directory = directory
+        self.failed_dir = os.path.join(directory, "failed")
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.jpeg_quality = jpeg_quality
+        self.put_timeout = put_timeout
+        self.cond = threading.Condition()
+        self.pending = {}  # seq -> time the entry is due
+        self.in_flight = set()
+        self.closed = False
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.next_seq = self._replay()
+
+    def _path(self, seq, ext):
+        return os.path.join(self.directory, f"{seq:012d}.{ext}")
+
+    def _replay(self):
+        last = 0
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            stem, ext = os.path.splitext(name)
+            if ext == ".tmp":
+                os.remove(path)  # interrupted write
+            elif ext == ".json" and stem.isdigit():
+                seq = int(stem)
+                if os.path.exists(self._path(seq, "jpg")):
+                    self.pending[seq] = 0
+                else:
+                    os.remove(path)
+                last = max(last, seq)
+        # Failed entries keep their numbers too: a reused number would overwrite them in failed/
+        for name in os.listdir(self.failed_dir):
+            stem = name.split(".")[0]
+            if stem.isdigit():
+                last = max(last, int(stem))
+        if self.pending:
+            print(f"Replaying {len(self.pending)} unsent alert(s) from '{self.directory}'.")
+        return last + 1
+
+    def _write(self, path, data):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def __len__(self):
+        with self.cond:
+            return len(self.pending) + len(self.in_flight)
+
+    def put(self, timestamp, camera_info, frame, recipients=None):
+        """Spool an alert. Returns False if the queue stayed full for `put_timeout` seconds."""
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError("Could not encode alert snapshot")
+        with self.cond:
+            if not self.cond.wait_for(lambda: len(self.pending) + len(self.in_flight) < self.max_pending,
+                                      self.put_timeout):
+                print(f"Alert queue '{self.directory}' is full, dropping alert from {timestamp}.")
+                return False
+            seq = self.next_seq
+            self.next_seq += 1
+            # Reserve the slot before writing so the limit holds for concurrent producers
+            self.in_flight.add(seq)
+        try:
+            meta = {"timestamp": timestamp, "camera_info": camera_info,
+                    "recipients": recipients, "attempts": 0}
+            self._write(self._path(seq, "jpg"), jpeg.tobytes())
+            self._write(self._path(seq, "json"), json.dumps(meta).encode())
+        finally:
+            with self.cond:
+                self.in_flight.discard(seq)
+                if os.path.exists(self._path(seq, "json")):
+                    self.pending[seq] = 0
+                self.cond.notify_all()
+        return True
+
+    def get(self, timeout=None):
+        """
+        Wait for the oldest due entry. Returns (seq, timestamp, camera_info, frame, recipients)
+        or None on timeout or once the queue is closed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while not self.closed:
+                now = time.time()
+                due = [seq for seq, due_at in self.pending.items() if due_at <= now]
+                if due:
+                    seq = min(due)
+                    del self.pending[seq]
+                    self.in_flight.add(seq)
+                    break
+                wait = min(self.pending.values()) - now if self.pending else None
+                if deadline is not None:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return None
+                    wait = left if wait is None else min(wait, left)
+                self.cond.wait(wait)
+            else:
+                return None
+
+        try:
+            with open(self._path(seq, "json")) as f:
+                meta = json.load(f)
+            frame = cv2.imread(self._path(seq, "jpg"))
+            if frame is None:
+                raise ValueError("snapshot could not be decoded")
+        except (OSError, ValueError) as e:
+            print(f"Dropping unreadable alert {seq}:", e)
+            self._discard(seq)
+            return self.get(timeout)
+        return seq, meta["timestamp"], meta["camera_info"], frame, meta["recipients"]
+
+    def _discard(self, seq):
+        for ext in ("jpg", "json"):
+            try:
+                os.remove(self._path(seq, ext))
+            except FileNotFoundError:
+                pass
+        with self.cond:
+            self.in_flight.discard(seq)
+            self.cond.notify_all()
+
+    def ack(self, seq):
+        """The alert was delivered: delete it from disk."""
+        self._discard(seq)
+
+    def nack(self, seq, recipients=None):
+        """
+        The alert could not be delivered: retry later, or give up after `max_attempts`.
+        After a partial delivery, pass the `recipients` that didn't get it so only they are retried.
+        """
+        json_path = self._path(seq, "json")
+        with open(json_path) as f:
+            meta = json.load(f)
+        meta["attempts"] += 1
+        if recipients is not None:
+            meta["recipients"] = list(recipients)
+        if meta["attempts"] >= self.max_attempts:
+            print(f"Giving up on alert {seq} after {meta['attempts']} attempts, kept in '{self.failed_dir}'.")
+            for ext in ("jpg", "json"):
+                os.replace(self._path(seq, ext), os.path.join(self.failed_dir, f"{seq:012d}.{ext}"))
+            with self.cond:
+                self.in_flight.discard(seq)
+                self.cond.notify_all()
+            return
+        self._write(json_path, json.dumps(meta).encode())
+        delay = min(self.retry_delay * 2 ** (meta["attempts"] - 1), self.max_retry_delay)
+        with self.cond:
+            self.in_flight.discard(seq)
+            self.pending[seq] = time.time() + delay
+            self.cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until nothing is due or being sent (entries waiting for a retry don't count)."""
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: not self.in_flight and all(due_at > time.time() for due_at in self.pending.values()),
+                timeout)
+
+    def close(self):
+        """Wake up waiting consumers; unsent entries stay on disk for the next run."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
@@ -0,0 +1,150 @@
+import os
+import time
+import threading
+
+from utils import arrange_frames, queue_email_alert, queue_whatsapp_alert
+
+# Per channel and recipient: (burst size, seconds to refill one token)
+CHANNEL_RATE_LIMITS = {
+    "email": (5, 60),
+    "whatsapp": (3, 120),
+}
+
+
+def env_recipients(name):
+    """Read a comma separated list of recipients from an environment variable."""
+    value = os.getenv(name) or ""
+    return [r.strip() for r in value.split(",") if r.strip()]
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, one token refilled every `refill_period` seconds."""
+
+    def __init__(self, capacity, refill_period):
+        self.capacity = capacity
+        self.refill_period = refill_period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self, tokens=1):
+        """Take `tokens` from the bucket. Returns False if not enough are available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) / self.refill_period)
+        self.updated_at = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+def merge_camera_info(cams):
+    """Combine several camera entries into one so the existing alert templates can describe them."""
+    return {
+        "name": ", ".join(c.get("name", "Cam Undefined") for c in cams),
+        "desc": "; ".join(f"{c.get('name', 'Cam Undefined')}: {c.get('desc', 'No description')}" for c in cams),
+        "link": ", ".join(c.get("link", "no link") for c in cams),
+    }
+
+
+class AlertAggregator:
+    """
+    Coalesces detections from all cameras into one digest per window.
+
+    The first detection opens a window of `window` seconds. Every camera that fires
+    during that window is folded into the same digest (latest frame per camera), which
+    is then sent once per channel with a grid image built by `arrange_frames` at the
+    resolution of the largest snapshot, so the evidence stays sharp.
+    Each channel/recipient pair is throttled by its own token bucket.
+    """
+
+    def __init__(self, window=5, rate_limits=CHANNEL_RATE_LIMITS):
+        self.window = window
+        self.rate_limits = rate_limits
+        self.channels = {
+            "email": (lambda: env_recipients("RECEIVER_EMAIL"), queue_email_alert),
+            "whatsapp": (lambda: env_recipients("PHONE_NUM"), queue_whatsapp_alert),
+        }
+        self.buckets = {}
+        self.pending = {}
+        self.opened_at = None
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the dispatch thread."""
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Flush whatever is pending and stop the dispatch thread."""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def submit(self, timestamp, camera_info, frame):
+        """
+        Add a detection to the current digest, opening a new window if none is open.
+        The aggregator keeps `frame` as is: pass a copy the caller won't touch again.
+        """
+        key = camera_info.get("link", camera_info.get("name"))
+        with self.cond:
+            if not self.pending:
+                self.opened_at = time.monotonic()
+            # Only the latest frame per camera is kept, so memory is bounded by the camera count
+            self.pending[key] = (timestamp, camera_info, frame)
+            self.cond.notify()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                while self.running and time.monotonic() - self.opened_at < self.window:
+                    self.cond.wait(self.window - (time.monotonic() - self.opened_at))
+                batch = list(self.pending.values())
+                self.pending = {}
+                running = self.running
+            if batch:
+                try:
+                    self.dispatch(batch)
+                except Exception as e:
+                    print("Error dispatching alert digest:", e)
+            if not running:
+                break
+
+    def allowed_recipients(self, channel, recipients):
+        """Filter `recipients` down to the ones whose token bucket still has room."""
+        allowed = []
+        for recipient in recipients:
+            bucket = self.buckets.get((channel, recipient))
+            if bucket is None:
+                bucket = TokenBucket(*self.rate_limits[channel])
+                self.buckets[(channel, recipient)] = bucket
+            if bucket.consume():
+                allowed.append(recipient)
+            else:
+                print(f"Rate limit reached for {channel} recipient {recipient}, skipping.")
+        return allowed
+
+    def dispatch(self, batch):
+        """Send one digest for a batch of (timestamp, camera_info, frame) detections."""
+        timestamp = batch[0][0]
+        cams = [camera_info for _, camera_info, _ in batch]
+        frames = [frame for _, _, frame in batch]
+        if len(batch) == 1:
+            camera_info, image = cams[0], frames[0]
+        else:
+            # Tiles as large as the largest snapshot: the default 320x240 tiles would throw
+            # away the main-stream resolution the snapshots were grabbed for
+            largest = max((f for f in frames if f is not None), key=lambda f: f.shape[0] * f.shape[1])
+            tile_size = (largest.shape[1], largest.shape[0])
+            camera_info, image = merge_camera_info(cams), arrange_frames(frames, frame_size=tile_size, cams=cams)
+
+        for channel, (get_recipients, send) in self.channels.items():
+            recipients = self.allowed_recipients(channel, get_recipients())
+            if recipients:
+                send(timestamp, camera_info, image, recipients)
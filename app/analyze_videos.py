@@ -0,0 +1,172 @@
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+from utils import frame_changed, detect_motion
+from adaptive_motion import AdaptiveMotionControl
+from detectors import create_detector
+from models import DEFAULT_MODEL, DEFAULT_VARIANT
+from config_watcher import load_config
+from resources import apply_resources
+
+# Offline scan of recorded footage for people, as fast as the CPU allows.
+# Every video is decoded and motion-gated in its own thread (OpenCV releases the GIL);
+# frames with motion are batched across videos into the detector, whose backend
+# (onnxruntime / cv2.dnn) already spreads each batch over all cores.
+# Usage: python analyze_videos.py <output.json|output.csv> <sample_fps> <video> [<video> ...]
+
+model_name = DEFAULT_MODEL
+model_variant = DEFAULT_VARIANT
+threshold = 0.5
+batch_size = 8
+motion_hold = 5  # seconds of video sent to the detector after the last motion
+background_refresh_interval = 25
+video_workers = os.cpu_count() or 1
+
+CSV_FIELDS = ["video", "time", "timecode", "x1", "y1", "x2", "y2", "score"]
+
+
+def timecode(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def put(out_queue, item, stop):
+    """Put on the bounded queue unless `stop` is set; returns False if it was."""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def read_video(path, sample_fps, out_queue, stop):
+    """
+    Decode `path` at `sample_fps` and put (path, seconds, frame) on `out_queue` for every
+    sampled frame that has motion (or follows motion by less than `motion_hold` seconds).
+    Skipped frames are only grabbed, never decoded. Ends with (path, None, stats).
+    Gives up as soon as `stop` is set, so a failing consumer can't leave it blocked on the queue.
+    """
+    stats = {"sampled": 0, "gated": 0, "duration": 0.0}
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"Unable to open video {path}")
+        put(out_queue, (path, None, stats), stop)
+        return
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    control = AdaptiveMotionControl()
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    thumbnails, last_motion_ats = [None], [0]
+    unchanged = 0
+    frame_index = -1
+    next_sample = 0.0
+    motion_until = -1.0
+    try:
+        while not stop.is_set() and cap.grab():
+            frame_index += 1
+            seconds = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or frame_index / video_fps
+            stats["duration"] = seconds
+            if seconds < next_sample:
+                continue
+            # From this frame on: timestamps that start at an offset or jump over a gap
+            # must not make every frame until the schedule catches up count as due
+            next_sample = max(next_sample, seconds) + 1.0 / sample_fps
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            stats["sampled"] += 1
+
+            if frame_changed(frame, thumbnails, 0) or unchanged >= background_refresh_interval:
+                unchanged = 0
+                control.observe(frame, thumbnails[0])
+                boxes = detect_motion(control.backSub, kernel, frame, last_motion_ats, 0,
+                                      learning_rate=control.learning_rate, min_area=control.min_area)
+                if len(boxes):
+                    motion_until = seconds + motion_hold
+            else:
+                unchanged += 1
+
+            if seconds <= motion_until:
+                stats["gated"] += 1
+                if not put(out_queue, (path, seconds, frame), stop):
+                    break
+    finally:
+        cap.release()
+        put(out_queue, (path, None, stats), stop)
+
+
+def analyze(paths, sample_fps):
+    """Scan `paths` and return (rows, stats) with one row per person detection."""
+    detector = create_detector(model_name, model_variant, threshold=threshold)
+    detector.model  # load before any reader starts, so a missing model fails right away
+    stop = threading.Event()
+    frames_queue = queue.Queue(maxsize=batch_size * 4)  # bounds decoded frames in flight
+    rows = []
+    stats = {"sampled": 0, "gated": 0, "duration": 0.0}
+
+    def flush(batch):
+        for (path, seconds, _), detections in zip(batch, detector.detect([frame for _, _, frame in batch])):
+            for x1, y1, x2, y2, score in detections:
+                rows.append({"video": path, "time": round(seconds, 3), "timecode": timecode(seconds),
+                             "x1": int(x1), "y1": int(y1), "x2": int(x2), "y2": int(y2),
+                             "score": round(float(score), 3)})
+        batch.clear()
+
+    with ThreadPoolExecutor(max_workers=min(video_workers, len(paths))) as executor:
+        for path in paths:
+            executor.submit(read_video, path, sample_fps, frames_queue, stop)
+        remaining = len(paths)
+        batch = []
+        try:
+            while remaining:
+                path, seconds, item = frames_queue.get()
+                if seconds is None:
+                    remaining -= 1
+                    for key in stats:
+                        stats[key] += item[key]
+                    print(f"Finished {path}: {item['sampled']} frames sampled, {item['gated']} with motion")
+                else:
+                    batch.append((path, seconds, item))
+                if len(batch) >= batch_size or (batch and not remaining):
+                    flush(batch)
+        finally:
+            # Release readers blocked on the full queue before the executor waits for them
+            stop.set()
+
+    rows.sort(key=lambda row: (row["video"], row["time"]))
+    return rows, stats
+
+
+def write_results(rows, output):
+    if output.lower().endswith(".csv"):
+        with open(output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(output, "w") as f:
+            json.dump(rows, f, indent=4)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python analyze_videos.py <output.json|output.csv> <sample_fps> <video> [<video> ...]")
+        sys.exit(1)
+    output, sample_fps, paths = sys.argv[1], float(sys.argv[2]), sys.argv[3:]
+    apply_resources(load_config("data.json")[1])
+
+    start = time.perf_counter()
+    rows, stats = analyze(paths, sample_fps)
+    elapsed = time.perf_counter() - start
+    write_results(rows, output)
+    print(f"{len(rows)} person detections in {stats['gated']} of {stats['sampled']} sampled frames -> {output}")
+    print(f"{stats['duration']:.0f} s of video in {elapsed:.1f} s ({stats['duration'] / max(elapsed, 1e-6):.1f}x real time)")
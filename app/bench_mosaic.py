@@ -0,0 +1,32 @@
+import time
+import numpy as np
+
+from utils import arrange_frames
+from mosaic import MosaicRenderer
+
+# Benchmark the live view mosaic: arrange_frames vs the persistent MosaicRenderer.
+# Usage: python bench_mosaic.py
+
+ITERATIONS = 300
+FRAME_SHAPE = (576, 704, 3)  # typical D1 sub-stream
+
+
+def bench(fn, frames, cams):
+    fn(frames, cams)  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(frames, cams)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"{'tiles':>5} {'arrange_frames (ms)':>20} {'MosaicRenderer (ms)':>20} {'speedup':>8}")
+    for tiles in (4, 9, 16):
+        frames = [rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8) for _ in range(tiles)]
+        cams = [{"name": f"cam{i + 1}"} for i in range(tiles)]
+        renderer = MosaicRenderer()
+
+        old = bench(lambda f, c: arrange_frames(f, cams=c), frames, cams)
+        new = bench(renderer.render, frames, cams)
+        print(f"{tiles:>5} {old:>20.3f} {new:>20.3f} {old / new:>7.2f}x")
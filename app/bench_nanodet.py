@@ -0,0 +1,64 @@
+import sys
+import time
+import cv2
+import numpy as np
+
+from utils import run_nanodet_onnx_batch
+from models import MODEL_REGISTRY, CALIBRATION_DIR, calibration_frames
+
+# Throughput of NanoDet preprocessing + inference on recorded images (decode included).
+# Postprocessing is kept out of the measurement with a score threshold nothing passes.
+# Usage: python bench_nanodet.py [images_dir] [batch_size]
+
+REPEATS = 3
+NO_DETECTIONS = 1.01
+
+
+def per_image_batch(paths, session, batch_size, input_size):
+    """The previous pipeline: decode, resize, cvtColor, astype, /255, transpose and stack one image at a time."""
+    input_name = session.get_inputs()[0].name
+    for i in range(0, len(paths), batch_size):
+        batch = []
+        for path in paths[i:i + batch_size]:
+            img = cv2.resize(cv2.imread(path), (input_size, input_size))
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            img = img.astype(np.float32) / 255.0
+            batch.append(np.transpose(img, (2, 0, 1)))
+        session.run(None, {input_name: np.array(batch, dtype=np.float32)})
+
+
+def images_per_second(fn, paths):
+    fn(paths[:1])  # warm-up
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(paths)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(paths) / best
+
+
+if __name__ == "__main__":
+    import onnxruntime as ort
+
+    images_dir = sys.argv[1] if len(sys.argv) > 1 else CALIBRATION_DIR
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    spec = MODEL_REGISTRY["nanodet"]
+    size = spec["input_size"]
+    session = ort.InferenceSession(spec["path"], providers=["CPUExecutionProvider"])
+    paths = calibration_frames(images_dir)
+
+    runs = [
+        ("per-image, sequential (before)", lambda p: per_image_batch(p, session, batch_size, size)),
+        ("fused, sequential", lambda p: run_nanodet_onnx_batch(p, score_thresh=NO_DETECTIONS, batch_size=batch_size,
+                                                               session=session, input_size=size, workers=0)),
+        ("fused, thread pool + double buffer", lambda p: run_nanodet_onnx_batch(p, score_thresh=NO_DETECTIONS,
+                                                                                batch_size=batch_size,
+                                                                                session=session, input_size=size)),
+    ]
+    print(f"{len(paths)} images from '{images_dir}', batch size {batch_size}")
+    baseline = None
+    for name, fn in runs:
+        rate = images_per_second(fn, paths)
+        baseline = baseline or rate
+        print(f"{name:<36} {rate:>8.1f} images/s {rate / baseline:>6.2f}x")
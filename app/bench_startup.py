@@ -0,0 +1,26 @@
+import sys
+import time
+import subprocess
+
+# Cold-start cost of the app modules: each import runs in a fresh interpreter.
+# Usage: python bench_startup.py [module ...]
+
+REPEATS = 5
+DEFAULT_TARGETS = ["cv2, numpy", "utils", "alerts", "detectors", "detective"]
+
+
+def cold_import_time(statement):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {statement}"], check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    targets = sys.argv[1:] or DEFAULT_TARGETS
+    print(f"{'import':<40} {'best of ' + str(REPEATS) + ' (ms)':>18}")
+    for target in targets:
+        print(f"{target:<40} {cold_import_time(target) * 1000:>18.0f}")
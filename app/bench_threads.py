@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import subprocess
+import numpy as np
+import cv2
+
+# Sweep of the resource settings (see resources.py) on a detect()-like workload: every pass
+# runs the motion stage on each camera (cv2 threads) and one batched NanoDet call for all of
+# them (preprocess pool + onnxruntime). Each setting runs in a fresh process pinned to the
+# first N cores, so one machine can report 4-, 8- and 16-core results (core counts larger
+# than the machine are skipped).
+# Usage: python bench_threads.py [seconds_per_run] [cameras]
+
+CORE_COUNTS = (4, 8, 16)
+FRAME_SHAPE = (576, 704, 3)
+
+
+def settings_grid(cores):
+    grid = []
+    for cv2_threads in sorted({1, max(1, cores // 2), cores}):
+        for ort_threads in sorted({1, max(1, cores // 2), cores}):
+            for workers in sorted({1, max(1, cores // 2)}):
+                grid.append((cv2_threads, ort_threads, workers))
+    return grid
+
+
+def run_child(seconds, num_cams):
+    """Workload of one setting, configured through the environment by the parent."""
+    from utils import frame_changed, detect_motion
+    from resources import apply_resources
+    from adaptive_motion import AdaptiveMotionControl
+    from detectors import create_detector
+
+    apply_resources()
+    detector = create_detector("nanodet")
+    rng = np.random.default_rng(0)
+    sources = [[rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8) for _ in range(2)] for _ in range(num_cams)]
+    controls = [AdaptiveMotionControl() for _ in range(num_cams)]
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    thumbnails, last_motion_ats = [None] * num_cams, [0] * num_cams
+    detector.warm_up([FRAME_SHAPE] * num_cams)
+
+    passes = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        frames = [frames_[passes % 2] for frames_ in sources]
+        for idx, frame in enumerate(frames):
+            frame_changed(frame, thumbnails, idx)
+            control = controls[idx]
+            control.observe(frame, thumbnails[idx])
+            detect_motion(control.backSub, kernel, frame, last_motion_ats, idx,
+                          learning_rate=control.learning_rate, min_area=control.min_area)
+        detector.detect(frames)
+        passes += 1
+    print(passes / (time.perf_counter() - start))
+
+
+def run_setting(cores, setting, seconds, num_cams):
+    cv2_threads, ort_threads, workers = setting
+    env = dict(os.environ, CPU_AFFINITY=f"0-{cores - 1}", CV2_THREADS=str(cv2_threads),
+               ORT_INTRA_OP_THREADS=str(ort_threads), ORT_INTER_OP_THREADS="1",
+               PREPROCESS_WORKERS=str(workers))
+    result = subprocess.run([sys.executable, __file__, "--child", str(seconds), str(num_cams)],
+                            env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(float(sys.argv[2]), int(sys.argv[3]))
+        sys.exit(0)
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    num_cams = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    core_counts = [c for c in CORE_COUNTS if c <= available] or [available]
+
+    print(f"{num_cams} cameras, {seconds:.0f}s per run, {available} cores available")
+    for cores in core_counts:
+        print(f"\n{cores} cores")
+        print(f"{'cv2_threads':>11} {'ort_intra_op':>12} {'preprocess':>10} {'passes/s':>9}")
+        results = []
+        for setting in settings_grid(cores):
+            rate = run_setting(cores, setting, seconds, num_cams)
+            results.append((rate, setting))
+            print(f"{setting[0]:>11} {setting[1]:>12} {setting[2]:>10} {rate:>9.2f}")
+        rate, best = max(results)
+        print(f"best: CV2_THREADS={best[0]} ORT_INTRA_OP_THREADS={best[1]} PREPROCESS_WORKERS={best[2]} ({rate:.2f} passes/s)")
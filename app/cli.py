@@ -2,29 +2,71 @@ import npyscreen
 import json
 import os
 
-from whatnot import login_and_save_session
+from config_watcher import load_config, save_config, file_signature
 
 JSON_FILEPATH = "data.json"
 
 
-def load_data():
-    if not os.path.exists(JSON_FILEPATH):
-        with open(JSON_FILEPATH, 'w') as f:
-            json.dump([], f)
-
-    try:
-        with open(JSON_FILEPATH, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        # Reinitialize the file with an empty list if it's invalid
-        with open(JSON_FILEPATH, 'w') as f:
-            json.dump([], f)
-        return []
-
-
-def save_data(data):
-    with open(JSON_FILEPATH, 'w') as f:
-        json.dump(data, f, indent=4)
+def camera_label(idx, camera):
+    return f"{idx + 1}. {camera['name']}"
+
+
+class CameraStore:
+    """
+    In-memory copy of data.json. The file is read once; every edit changes the list in
+    place and saves it atomically with a new version (see config_watcher.save_config), so
+    a running detector never sees a partial file. Global settings ("resources", ...) are
+    kept as they are. If the file was changed by someone else since it was read, the edit
+    is not saved and the store reloads instead (save returns False).
+    """
+
+    def __init__(self, path=JSON_FILEPATH):
+        self.path = path
+        self.load()
+
+    def load(self):
+        try:
+            self.cameras, self.settings = load_config(self.path)
+        except json.JSONDecodeError:
+            # Start over with an empty list if it's invalid; the next save replaces it
+            self.cameras, self.settings = [], {}
+        self.labels = [camera_label(idx, cam) for idx, cam in enumerate(self.cameras)]
+        self.signature = file_signature(self.path)
+
+    @property
+    def version(self):
+        return self.settings.get("version", 0)
+
+    def save(self):
+        if file_signature(self.path) != self.signature:
+            self.load()
+            return False
+        self.settings = save_config(self.path, self.cameras, self.settings)
+        self.signature = file_signature(self.path)
+        return True
+
+    def add(self, camera):
+        self.cameras.append(camera)
+        self.labels.append(camera_label(len(self.cameras) - 1, camera))
+        return self.save()
+
+    def update(self, idx, camera):
+        self.cameras[idx] = camera
+        self.labels[idx] = camera_label(idx, camera)
+        return self.save()
+
+    def delete(self, idx):
+        self.cameras.pop(idx)
+        self.labels.pop(idx)
+        # Only the entries after the deleted one are renumbered
+        for k in range(idx, len(self.cameras)):
+            self.labels[k] = camera_label(k, self.cameras[k])
+        return self.save()
+
+
+def notify_conflict():
+    npyscreen.notify_confirm(f"{JSON_FILEPATH} was changed by another program and has been reloaded. "
+                             "Your change was not saved, please redo it.", title="Reloaded", editw=2)
 
 class CameraEditor(npyscreen.FormBaseNew):
     def create(self):
@@ -42,17 +84,9 @@ class CameraEditor(npyscreen.FormBaseNew):
         })
 
     def update_list(self):
-        # Load the updated data
-        self.parentApp.camera_data = load_data()
-
-        # Explicitly clear the camera list widget
-        self._clear_all_widgets()
-        self.add(npyscreen.FixedText, value="📸 Camera List (Press A: Add, E: Edit, D: Delete, Q: Quit, V: Edit Env)", editable=False)
-        self.camera_list = self.add(npyscreen.SelectOne, max_height=10, scroll_exit=True)
-        
-        # Forcefully reinitialize the widget to clear any residual artifacts
-        self.camera_list.values = [f"{i+1}. {c['name']}" for i, c in enumerate(self.parentApp.camera_data)]
-        self.camera_list.value = None  # Reset selection for non-empty lists
+        # The widget shows the store's label list; only its visible rows are redrawn
+        self.camera_list.values = self.parentApp.store.labels
+        self.camera_list.value = []
         self.camera_list.display()
 
     def add_camera(self, *args):
@@ -69,20 +103,12 @@ class CameraEditor(npyscreen.FormBaseNew):
         idxs = self.camera_list.value
         if idxs:
             idx = idxs[0]
-            name = self.parentApp.camera_data[idx]['name']
+            name = self.parentApp.store.cameras[idx]['name']
             if npyscreen.notify_yes_no(f"Delete '{name}'?", title="Confirm", editw=2):
-                # Delete the selected camera
-                self.parentApp.camera_data.pop(idx)
-
-                save_data(self.parentApp.camera_data)
-
-                self.parentApp.camera_data = load_data()
-                
-                # Forcefully reinitialize the widget to clear any residual artifacts
-                self.camera_list.values = [f"{i+1}. {c['name']}" for i, c in enumerate(self.parentApp.camera_data)]
-                self.camera_list.value = []  # Reset selection for non-empty lists
-                self.camera_list.display()
-                
+                if not self.parentApp.store.delete(idx):
+                    notify_conflict()
+                self.update_list()
+
     def quit_app(self, *args):
         self.parentApp.setNextForm(None)
         self.editing = False
@@ -96,36 +122,70 @@ class EditCameraForm(npyscreen.ActionForm):
         self.name = self.add(npyscreen.TitleText, name="Name:")
         self.link = self.add(npyscreen.TitleText, name="Link:")
         self.description = self.add(npyscreen.TitleText, name="Description:")
+        self.add(npyscreen.FixedText, value="Zones: JSON list of polygons, points as [x, y] in 0-1, e.g. [[[0,0],[0.5,0],[0.5,1],[0,1]]]", editable=False)
+        self.include_zones = self.add(npyscreen.TitleText, name="Include zones:")
+        self.exclude_zones = self.add(npyscreen.TitleText, name="Exclude zones:")
         self.index = None
 
     def beforeEditing(self):
         if self.index is not None:
-            cam = self.parentApp.camera_data[self.index]
+            cam = self.parentApp.store.cameras[self.index]
             self.name.value = cam.get("name", "")
             self.link.value = cam.get("link", "")
             self.description.value = cam.get("desc", "")
+            self.include_zones.value = json.dumps(cam["include_zones"]) if cam.get("include_zones") else ""
+            self.exclude_zones.value = json.dumps(cam["exclude_zones"]) if cam.get("exclude_zones") else ""
         else:
             self.name.value = ""
             self.link.value = ""
             self.description.value = ""
+            self.include_zones.value = ""
+            self.exclude_zones.value = ""
+
+    def parse_zones(self, widget, label):
+        """Parse a zones field; returns the polygon list ([] if empty) or None if invalid."""
+        text = widget.value.strip()
+        if not text:
+            return []
+        try:
+            zones = json.loads(text)
+            if all(len(polygon) >= 3 and all(len(point) == 2 and 0 <= point[0] <= 1 and 0 <= point[1] <= 1
+                                             for point in polygon) for polygon in zones):
+                return zones
+        except (json.JSONDecodeError, TypeError):
+            pass
+        npyscreen.notify_confirm(f"{label} must be a list of polygons with at least 3 [x, y] points in 0-1.", title="Error", editw=2)
+        return None
 
     def on_ok(self):
         if not all([self.name.value.strip(), self.link.value.strip(), self.description.value.strip()]):
             npyscreen.notify_confirm("All fields are required!", title="Error", editw=2)
             return
 
-        new_data = {
+        include_zones = self.parse_zones(self.include_zones, "Include zones")
+        exclude_zones = self.parse_zones(self.exclude_zones, "Exclude zones")
+        if include_zones is None or exclude_zones is None:
+            return
+
+        # Keep settings this form doesn't edit (model, analysis_fps, ...)
+        new_data = dict(self.parentApp.store.cameras[self.index]) if self.index is not None else {}
+        new_data.update({
             "name": self.name.value.strip(),
             "link": self.link.value.strip(),
             "desc": self.description.value.strip()
-        }
+        })
+        for key, zones in (("include_zones", include_zones), ("exclude_zones", exclude_zones)):
+            if zones:
+                new_data[key] = zones
+            else:
+                new_data.pop(key, None)
 
         if self.index is not None:
-            self.parentApp.camera_data[self.index] = new_data
+            saved = self.parentApp.store.update(self.index, new_data)
         else:
-            self.parentApp.camera_data.append(new_data)
-
-        save_data(self.parentApp.camera_data)
+            saved = self.parentApp.store.add(new_data)
+        if not saved:
+            notify_conflict()
 
         # Update the main screen list and reset selection
         main_form = self.parentApp.getForm("MAIN")
@@ -170,17 +230,20 @@ class EditEnvForm(npyscreen.ActionForm):
 
 class CameraApp(npyscreen.NPSAppManaged):
     def onStart(self):
-        self.camera_data = load_data()
+        self.store = CameraStore()
         self.addForm("MAIN", CameraEditor, name="Camera Manager")
         self.addForm("EDIT", EditCameraForm, name="Edit Camera")
         self.addForm("ENV", EditEnvForm, name="Edit Environment Variables") 
 
 if __name__ == "__main__":
-    load_data()
     app = CameraApp()
     app.run()
     from dotenv import load_dotenv
+    from whatnot import login_and_save_session
     load_dotenv()
     phone_num = os.getenv('PHONE_NUM')
-    print(f"Now you need to manually login to WhatsApp Web({phone_num}) using the provided code. Please wait for it.")
-    login_and_save_session(phone_num)
+    # One login per pooled driver profile (see WHATSAPP_DRIVERS)
+    for slot in range(int(os.getenv('WHATSAPP_DRIVERS', 1))):
+        profile_dir = "whatsapp-profile" if slot == 0 else f"whatsapp-profile-{slot}"
+        print(f"Now you need to manually login to WhatsApp Web({phone_num}) using the provided code. Please wait for it.")
+        login_and_save_session(phone_num, profile_dir=profile_dir)
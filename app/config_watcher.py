@@ -0,0 +1,115 @@
+import os
+import json
+import time
+
+
+def parse_config(data):
+    """
+    data.json holds either the plain camera list or an object {"cameras": [...], ...} whose
+    other keys are global settings (e.g. "resources"). Returns (cameras, settings).
+    """
+    if isinstance(data, dict):
+        return data.get("cameras", []), {key: value for key, value in data.items() if key != "cameras"}
+    return data, {}
+
+
+def load_config(path):
+    """Read and split data.json; a missing file means no cameras and default settings."""
+    if not os.path.exists(path):
+        return [], {}
+    with open(path, 'r') as file:
+        return parse_config(json.load(file))
+
+
+def file_signature(path):
+    """(inode, mtime, size) of a file, None if it doesn't exist. Atomic saves always change the inode."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def save_config(path, cameras, settings):
+    """
+    Write data.json atomically in its object form: readers see either the old or the new
+    file, never a truncated one. The "version" setting is incremented on every save.
+    Returns the new settings.
+    """
+    settings = dict(settings, version=settings.get("version", 0) + 1)
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as file:
+        json.dump({"cameras": cameras, **settings}, file, indent=4)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+    return settings
+
+
+class ConfigWatcher:
+    """
+    Cheap change detection for data.json.
+
+    `poll` stats the file at most every `interval` seconds and only re-reads it when
+    its inode, mtime or size changed. It returns the new camera list, or None when nothing
+    changed (or a hand edit doesn't parse yet; it is retried next poll). The global
+    settings of the last read are kept in `settings`, and the "version" counter written
+    by `save_config` in `version`.
+    """
+
+    def __init__(self, path, interval=2):
+        self.path = path
+        self.interval = interval
+        self.signature = file_signature(path)
+        self.checked_at = time.monotonic()
+        self.settings = {}
+        self.version = None
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.interval:
+            return None
+        self.checked_at = now
+
+        signature = file_signature(self.path)
+        if signature is None or signature == self.signature:
+            return None
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+        self.signature = signature
+        cameras, self.settings = parse_config(data)
+        self.version = self.settings.get("version")
+        return cameras
+
+
+def camera_key(camera_info):
+    return json.dumps(camera_info, sort_keys=True)
+
+
+def diff_cameras(old_cams, new_cams):
+    """
+    Match a new camera list against the running one.
+
+    Returns (order, removed): `order[i]` is the index in `old_cams` of the entry that is
+    identical to `new_cams[i]` (keep its stream and state) or None (open it), and
+    `removed` lists the old indices that no longer appear and must be closed.
+    An edited entry shows up as one removal plus one addition.
+    """
+    available = {}
+    for idx, cam in enumerate(old_cams):
+        available.setdefault(camera_key(cam), []).append(idx)
+
+    order = []
+    for cam in new_cams:
+        matches = available.get(camera_key(cam))
+        order.append(matches.pop(0) if matches else None)
+    removed = [idx for indices in available.values() for idx in indices]
+    return order, removed
+
+
+def remap(values, order, default):
+    """Reorder a per-camera list to follow `order`, filling new cameras with `default()`."""
+    return [values[idx] if idx is not None else default() for idx in order]
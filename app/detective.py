@@ -1,10 +1,24 @@
 import cv2
+import os
 import time
 from datetime import datetime
 from dotenv import load_dotenv
 import sys
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from utils import initialize_cameras, detect_motion, detect_human, arrange_frames, send_whatsapp_alert, shutdown_email_worker, queue_email_alert
+from utils import initialize_cameras, open_camera, frame_changed, compile_zone_mask, detect_motion, draw_person_boxes, start_alert_workers, shutdown_alert_workers, shutdown_whatsapp_sessions
+from detectors import camera_detector
+from alerts import AlertAggregator
+from mosaic import MosaicRenderer, DisplayThread
+from preview import PreviewServer
+from config_watcher import ConfigWatcher, load_config, diff_cameras, remap
+from adaptive_motion import AdaptiveMotionControl
+from pacing import StreamPacer
+from snapshots import SnapshotGrabber
+from health import Readiness
+from resources import apply_resources
 
 # Load environment variables
 load_dotenv()
@@ -13,61 +27,265 @@ load_dotenv()
 fps = 5
 check_period = 5
 notification_cooldown_period = 10 # 3 minutes
+alert_window = 5 # seconds to coalesce detections from several cameras into one alert
+config_poll_interval = 2 # seconds between data.json change checks
+background_refresh_interval = 25 # run MOG2 at least every N analysed frames even if nothing changed
+idle_analysis_fps = 0 # decode rate of cameras without motion; 0 decodes every frame ("analysis_fps" per camera overrides)
+reconnect_interval = 5 # seconds between attempts to reopen a camera whose stream failed or ended
+no_frame_wait = 0.5 # seconds to sleep when no camera delivered a frame in a pass
+stats_interval = 60 # seconds between motion statistics in the log and /healthz
+
+alert_aggregator = AlertAggregator(window=alert_window)
+snapshot_grabber = SnapshotGrabber()  # sharp alert images from the main stream (see snapshots.py)
+stop_event = threading.Event()  # set by SIGINT/SIGTERM, or 'q' in the display window
+readiness = Readiness(os.getenv('READY_FILE'))  # also served at /healthz and sent to systemd
+
+
+def request_shutdown(signum, frame):
+    """First signal stops the loop gracefully; a second one interrupts right away."""
+    if stop_event.is_set():
+        raise KeyboardInterrupt
+    print(f"Received {signal.Signals(signum).name}, shutting down...")
+    stop_event.set()
+
+
+def camera_stream(camera_info):
+    """Preview stream of a camera, keyed by its name so it survives reloads that reorder cameras."""
+    return f"cam/{camera_info.get('name', 'Cam Undefined')}"
+
+
+def release_reopened(future):
+    """Done-callback for a reopen nobody waits for anymore (camera removed, or shutting down)."""
+    if not future.cancelled() and future.result() is not None:
+        future.result().release()
+
+
+def warm_up_detectors(detectors, caps):
+    """Run every detector on dummy frames shaped like its cameras' streams, one alone and all at once."""
+    total = 0.0
+    for detector in dict.fromkeys(detectors):
+        shapes = [(int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640, 3)
+                  for cap, d in zip(caps, detectors) if d is detector]
+        seconds = detector.warm_up(shapes)
+        if seconds:
+            print(f"Warmed up {detector.model_name} ({detector.variant}) for {len(shapes)} camera(s) in {seconds:.2f}s")
+        total += seconds
+    return total
+
 
 def detect(is_show=False):
+    # Thread pools and CPU pinning first, so every model and worker started below follows them
+    apply_resources(load_config('data.json')[1])
+    watcher = ConfigWatcher('data.json', interval=config_poll_interval)
     caps, cams = initialize_cameras('data.json')
     if not caps:
         print("No cameras initialized. Exiting...")
         return
 
-    backSub = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=16, detectShadows=False)
+    # Per-camera detector ("model", "model_variant", "input_size", "threshold" in data.json),
+    # shared by cameras with identical settings and loaded on first use
+    detectors = [camera_detector(cam) for cam in cams]
+
+    # One background model per camera, tuned to its light and noise level
+    motion_controls = [AdaptiveMotionControl() for _ in caps]
     kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    start_alert_workers()
+    alert_aggregator.start()
+
+    renderer = MosaicRenderer()
+    if is_show:
+        display = DisplayThread()
+        display.start()
+
+    # Optional MJPEG preview at http://PREVIEW_HOST:PREVIEW_PORT/ (disabled when unset). It has no
+    # authentication, so it only listens on localhost unless PREVIEW_HOST says otherwise
+    preview = None
+    preview_port = int(os.getenv('PREVIEW_PORT', 0))
+    if preview_port:
+        preview = PreviewServer(port=preview_port, host=os.getenv('PREVIEW_HOST', '127.0.0.1'), readiness=readiness)
+        preview.stream("mosaic")
+        for cam in cams:
+            preview.stream(camera_stream(cam))
+        preview.start()
+
+    # Pay for model loading and first-forward allocations now, not on the first intrusion
+    readiness.set("warming_up")
+    warmup_seconds = warm_up_detectors(detectors, caps)
+    readiness.set("ready", cameras=len(caps), warmup_seconds=round(warmup_seconds, 2))
 
     has_motions = [False] * len(caps)
     last_motion_ats = [0] * len(caps)
     last_trespass_alert_times = [0] * len(caps)
-    frames = [0] * len(caps)
+    frames = [None] * len(caps)  # one decode buffer per camera, reused by retrieve()
+    overlays = [None] * len(caps)  # latest person detections, drawn on the mosaic only
+    last_decoded_ats = [0] * len(caps)
+    reconnect_ats = [0] * len(caps)
+    # Cameras are (re)opened on these threads so a slow or silent host never stalls the loop
+    reopen_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="reopen")
+    reopens = [None] * len(caps)  # pending open_camera future per camera
+    thumbnails = [None] * len(caps)
+    unchanged_counts = [0] * len(caps)
+    zone_masks = [None] * len(caps)  # (frame shape, mask) compiled from the camera's zones
 
-    isEnd = False
+    pacer = StreamPacer()
+    stats_at = time.time()
     i = 1
 
-    while not isEnd:
-        for idx, cap in enumerate(caps):
-            ret, frames[idx] = cap.read()
-            if not ret:
-                break
+    try:
+        while not stop_event.is_set():
+            # Hot-reload data.json: only added/edited cameras are opened and removed ones closed,
+            # untouched cameras keep their stream and motion/alert state
+            new_cams = watcher.poll()
+            if new_cams is not None:
+                old_cams = cams
+                order, removed = diff_cameras(cams, new_cams)
+                for idx in removed:
+                    pacer.forget(caps[idx])
+                    caps[idx].release()
+                    if reopens[idx] is not None:
+                        reopens[idx].add_done_callback(release_reopened)
+                # New cameras start as an unopened capture; the loop opens them in the background
+                caps = [caps[old] if old is not None else cv2.VideoCapture() for old in order]
+                cams = new_cams
+                reopens = remap(reopens, order, lambda: None)
+                has_motions = remap(has_motions, order, lambda: False)
+                last_motion_ats = remap(last_motion_ats, order, lambda: 0)
+                last_trespass_alert_times = remap(last_trespass_alert_times, order, lambda: 0)
+                frames = remap(frames, order, lambda: None)
+                overlays = remap(overlays, order, lambda: None)
+                last_decoded_ats = remap(last_decoded_ats, order, lambda: 0)
+                reconnect_ats = remap(reconnect_ats, order, lambda: 0)
+                thumbnails = remap(thumbnails, order, lambda: None)
+                unchanged_counts = remap(unchanged_counts, order, lambda: 0)
+                zone_masks = remap(zone_masks, order, lambda: None)
+                motion_controls = remap(motion_controls, order, AdaptiveMotionControl)
+                # New cameras' detectors are warmed up once their stream is open (see below)
+                detectors = [camera_detector(cam) for cam in cams]
+                if preview is not None:
+                    streams = {camera_stream(cam) for cam in cams}
+                    for idx in removed:
+                        if camera_stream(old_cams[idx]) not in streams:
+                            preview.remove_stream(camera_stream(old_cams[idx]))
+                    for stream in streams:
+                        preview.stream(stream)
+                added = sum(old is None for old in order)
+                print(f"Reloaded data.json (version {watcher.version}): {len(caps)} cameras, {added} to open, {len(removed)} closed")
+                if not caps:
+                    print("No cameras left, waiting for data.json to add some.")
 
-            if has_motions[idx]:
-                if i % fps != 0:
-                    i += 1
+            due = []
+            grabbed = 0
+            for idx, cap in enumerate(caps):
+                # Always grab so the stream stays current, but only decode idle cameras at
+                # their analysis rate; cameras with motion are decoded at full rate
+                if not cap.grab():
+                    # Dropped stream, end of file or not opened yet: skip this camera and reopen
+                    # it in the background every reconnect_interval, without holding up the others
+                    pacer.forget(cap)
+                    reopen = reopens[idx]
+                    if reopen is not None and reopen.done():
+                        reopens[idx] = None
+                        if reopen.result() is not None:
+                            cap.release()
+                            caps[idx] = reopen.result()
+                            # Only this camera's shape is new; cached shapes return at once
+                            warm_up_detectors([detectors[idx]], [caps[idx]])
+                    elif reopen is None and time.time() - reconnect_ats[idx] >= reconnect_interval:
+                        reconnect_ats[idx] = time.time()
+                        if cap.isOpened():
+                            print(f"Camera {cams[idx].get('name', idx)} stopped delivering frames, reopening it.")
+                        reopens[idx] = reopen_pool.submit(open_camera, cams[idx])
+                    continue
+                grabbed += 1
+                pacer.mark(cap)
+                analysis_fps = cams[idx].get('analysis_fps', idle_analysis_fps)
+                now = time.time()
+                if not has_motions[idx] and analysis_fps and now - last_decoded_ats[idx] < 1.0 / analysis_fps:
                     continue
-                i = 1
-
-                human_detected = detect_human(frames[idx])
-                if human_detected and time.time() - last_trespass_alert_times[idx] >= notification_cooldown_period:
-                    last_trespass_alert_times[idx] = time.time()
-                    detection_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    queue_email_alert(detection_time_str, cams[idx], frames[idx])
-                    send_whatsapp_alert(detection_time_str, cams[idx], frames[idx])
-
-                if time.time() - last_motion_ats[idx] > check_period:
-                    has_motions[idx] = False
-                    last_motion_ats[idx] = time.time()
-            else:
-                has_motions[idx] = detect_motion(backSub, kernel, frames[idx], last_motion_ats, idx)
-
-            if cv2.waitKey(1) == ord("q"):
-                isEnd = True
-        if cv2.waitKey(1) == ord("q"):
-            isEnd = True
+                last_decoded_ats[idx] = now
+                ret, frame = cap.retrieve(frames[idx])
+                if not ret:
+                    continue
+                frames[idx] = frame
 
-        if is_show:
-            final = arrange_frames(frames, cams=cams)
-            cv2.imshow("Frame", final)
+                if has_motions[idx]:
+                    if i % fps != 0:
+                        i += 1
+                        continue
+                    i = 1
+                    due.append(idx)
+
+                    if time.time() - last_motion_ats[idx] > check_period:
+                        has_motions[idx] = False
+                        overlays[idx] = None
+                        last_motion_ats[idx] = time.time()
+                elif frame_changed(frames[idx], thumbnails, idx) or unchanged_counts[idx] >= background_refresh_interval:
+                    unchanged_counts[idx] = 0
+                    if zone_masks[idx] is None or zone_masks[idx][0] != frames[idx].shape:
+                        zone_masks[idx] = (frames[idx].shape, compile_zone_mask(cams[idx], frames[idx].shape))
+                    control = motion_controls[idx]
+                    control.observe(frames[idx], thumbnails[idx])
+                    boxes = detect_motion(control.backSub, kernel, frames[idx], last_motion_ats, idx, zone_masks[idx][1],
+                                          learning_rate=control.learning_rate, min_area=control.min_area)
+                    has_motions[idx] = control.gate(len(boxes) > 0)
+                else:
+                    # Static scene: skip MOG2, morphology and contours for this frame
+                    unchanged_counts[idx] += 1
+
+                if preview is not None:
+                    preview.publish(camera_stream(cams[idx]), frames[idx])
+
+            # One batched call per detector for all cameras due this pass
+            for detector in dict.fromkeys(detectors[idx] for idx in due):
+                idxs = [idx for idx in due if detectors[idx] is detector]
+                for idx, detections in zip(idxs, detector.detect([frames[idx] for idx in idxs])):
+                    overlays[idx] = detections
+                    if len(detections) == 0:
+                        continue
+                    if time.time() - last_trespass_alert_times[idx] >= notification_cooldown_period:
+                        last_trespass_alert_times[idx] = time.time()
+                        detection_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        # The decode buffer is reused next pass: the alert gets its own annotated copy
+                        evidence = draw_person_boxes(frames[idx].copy(), detections)
+                        snapshot_grabber.request(detection_time_str, cams[idx], evidence, detections,
+                                                 alert_aggregator.submit)
 
-    for cap in caps:
-        cap.release()
-    cv2.destroyAllWindows()
+            if is_show or (preview is not None and preview.is_watched("mosaic")):
+                final = renderer.render(frames, cams, overlays)
+                if preview is not None:
+                    preview.publish("mosaic", final)
+                if is_show:
+                    display.show(final)
+
+            if is_show and display.quit_requested.is_set():
+                stop_event.set()
+
+            # Motion triggers dropped while a background was re-learning (each one is a detector
+            # call saved), reported so the effect of the adaptive control can be measured
+            if time.time() - stats_at >= stats_interval:
+                stats_at = time.time()
+                suppressed = {cam.get('name', idx): control.suppressed_triggers
+                              for idx, (cam, control) in enumerate(zip(cams, motion_controls))}
+                readiness.update(suppressed_triggers=suppressed)
+                if any(suppressed.values()):
+                    print("Motion triggers suppressed during background re-learning:", suppressed)
+
+            # Pace by stream timestamps (only sleeps when every stream is ahead of real time,
+            # e.g. video files); live streams are paced by grab() itself. With no frame at all
+            # (every stream down, or no cameras left after a reload) nothing blocks, so sleep.
+            stop_event.wait(pacer.delay() if grabbed else no_frame_wait)
+    finally:
+        # Release everything even if the loop failed, so streams are closed cleanly
+        if is_show:
+            display.stop()
+        if preview is not None:
+            preview.stop()
+        for reopen in reopens:
+            if reopen is not None:
+                reopen.add_done_callback(release_reopened)
+        reopen_pool.shutdown(wait=False, cancel_futures=True)
+        for cap in caps:
+            cap.release()
 
 
 if __name__ == "__main__":
@@ -76,10 +294,19 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         is_show = sys.argv[1].lower() == 'true'  # Second argument is whether to show frames
 
+    # Headless service mode (no GUI calls at all) unless frames are shown; SIGINT/SIGTERM
+    # stop the loop, then pending alerts are flushed and drained before exiting
+    signal.signal(signal.SIGINT, request_shutdown)
+    signal.signal(signal.SIGTERM, request_shutdown)
+
     print(f"Starting detection, Show frames: {is_show}")
     try:
         detect(is_show=is_show)
     except KeyboardInterrupt:
         print("Interrupted by user. Shutting down...")
     finally:
-        shutdown_email_worker()
+        readiness.set("stopping")
+        snapshot_grabber.stop()
+        alert_aggregator.stop()
+        shutdown_alert_workers()
+        shutdown_whatsapp_sessions()
@@ -0,0 +1,130 @@
+import time
+import cv2
+import numpy as np
+
+from models import MODEL_REGISTRY, DEFAULT_MODEL, DEFAULT_VARIANT, load_model
+from utils import run_nanodet_onnx_batch
+
+# Detectors shared by cameras with identical settings
+_detectors = {}
+
+
+class Detector:
+    """
+    Person detector interface.
+
+    `detect(frames)` takes a list of BGR frames and returns, for each frame, an
+    (K, 5) float array of person detections (x1, y1, x2, y2, score) in frame
+    coordinates. The model is only loaded on the first call.
+    """
+
+    def __init__(self, model_name, variant=DEFAULT_VARIANT, input_size=None, threshold=0.5):
+        self.model_name = model_name
+        self.variant = variant
+        self.input_size = input_size or MODEL_REGISTRY[model_name]["input_size"]
+        self.threshold = threshold
+        self._model = None
+        self.warmed = set()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_model(self.model_name, self.variant)
+        return self._model
+
+    def detect(self, frames):
+        raise NotImplementedError
+
+    def detect_one(self, frame):
+        return self.detect([frame])[0]
+
+    def warm_up(self, frame_shapes):
+        """
+        Load the model and run dummy batches shaped like the real ones (one frame, then one
+        frame per entry of `frame_shapes`), so lazy session creation and first-forward
+        allocations don't land on the first real detection. Returns the seconds spent.
+        """
+        key = tuple(tuple(shape) for shape in frame_shapes)
+        if key in self.warmed:
+            return 0.0
+        start = time.perf_counter()
+        frames = [np.zeros(shape, dtype=np.uint8) for shape in frame_shapes]
+        self.detect(frames[:1])
+        if len(frames) > 1:
+            self.detect(frames)
+        self.warmed.add(key)
+        return time.perf_counter() - start
+
+
+class MobileNetSSDDetector(Detector):
+    """MobileNet-SSD through cv2.dnn; the whole batch goes through a single forward pass."""
+
+    PERSON_CLASS = 15
+
+    def detect(self, frames):
+        if not frames:
+            return []
+        size = (self.input_size, self.input_size)
+        self.model.setInput(cv2.dnn.blobFromImages(frames, 0.007843, size, 127.5))
+        # (1, 1, N, 7): image id, class id, confidence, x1, y1, x2, y2 (normalized)
+        detections = self.model.forward()[0, 0]
+        keep = (detections[:, 2] > self.threshold) & (detections[:, 1].astype(int) == self.PERSON_CLASS)
+        detections = detections[keep]
+
+        results = []
+        for i, frame in enumerate(frames):
+            h, w = frame.shape[:2]
+            mine = detections[detections[:, 0] == i]
+            boxes = mine[:, 3:7] * np.array([w, h, w, h], dtype=np.float32)
+            results.append(np.column_stack([boxes, mine[:, 2]]))
+        return results
+
+
+class NanoDetDetector(Detector):
+    """NanoDet through onnxruntime; batches are limited by the exported model's batch dimension."""
+
+    PERSON_CLASS = 0
+
+    def detect(self, frames):
+        if not frames:
+            return []
+        batch_dim = self.model.get_inputs()[0].shape[0]
+        batch_size = batch_dim if isinstance(batch_dim, int) else len(frames)
+        outputs = run_nanodet_onnx_batch(frames, score_thresh=self.threshold, batch_size=batch_size,
+                                         session=self.model, input_size=self.input_size)
+        # Frames are letterboxed and boxes come back in frame coordinates
+        results = []
+        for result in outputs:
+            rows = [box + [score] for box, label, score in zip(result["boxes"], result["labels"], result["scores"])
+                    if label == self.PERSON_CLASS]
+            results.append(np.array(rows, dtype=np.float32).reshape(-1, 5))
+        return results
+
+
+DETECTOR_BACKENDS = {
+    "mobilenet_ssd": MobileNetSSDDetector,
+    "nanodet": NanoDetDetector,
+}
+
+
+def create_detector(model_name=DEFAULT_MODEL, variant=DEFAULT_VARIANT, input_size=None, threshold=0.5):
+    """Return a shared detector for these settings; nothing is loaded until it is first used."""
+    key = (model_name, variant, input_size, threshold)
+    if key not in _detectors:
+        if model_name not in DETECTOR_BACKENDS:
+            raise ValueError(f"Unknown detector '{model_name}', expected one of {list(DETECTOR_BACKENDS)}")
+        _detectors[key] = DETECTOR_BACKENDS[model_name](model_name, variant, input_size, threshold)
+    return _detectors[key]
+
+
+def camera_detector(camera_info):
+    """
+    Detector for a camera entry of data.json.
+
+    Optional keys: "model" (mobilenet_ssd or nanodet), "model_variant" (fp32, int8, and
+    optimized for ONNX models only), "input_size" (square model input in pixels) and "threshold" (min confidence).
+    """
+    return create_detector(camera_info.get("model", DEFAULT_MODEL),
+                           camera_info.get("model_variant", DEFAULT_VARIANT),
+                           camera_info.get("input_size"),
+                           camera_info.get("threshold", 0.5))
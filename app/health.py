@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import socket
+import threading
+
+
+def sd_notify(message):
+    """Send a systemd notification (READY=1, STOPPING=1, ...) when run as a Type=notify service."""
+    address = os.getenv("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]  # abstract socket
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message.encode(), address)
+    except OSError as e:
+        print("systemd notification failed:", e)
+
+
+class Readiness:
+    """
+    Lifecycle state of the detector for whoever supervises it.
+
+    The state moves from "starting" through "warming_up" (models loaded and run on dummy
+    batches) to "ready", and to "stopping" on shutdown. It is reported in three ways:
+    `/healthz` on the preview server (200 when ready, 503 otherwise), systemd's
+    READY=1/STOPPING=1 notifications, and optionally a JSON status file rewritten
+    atomically on every change (for Docker healthchecks and the like).
+    """
+
+    def __init__(self, status_file=None):
+        self.status_file = status_file
+        self.lock = threading.Lock()
+        self.state = None
+        self.since = None
+        self.details = {}
+        self.set("starting")
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def set(self, state, **details):
+        with self.lock:
+            self.state = state
+            self.since = time.time()
+            self.details = details
+            status = self._snapshot()
+        if self.status_file:
+            self._write(status)
+        if state == "ready":
+            sd_notify("READY=1")
+        elif state == "stopping":
+            sd_notify("STOPPING=1")
+
+    def update(self, **details):
+        """Add or refresh details (counters, ...) without changing the state."""
+        with self.lock:
+            self.details.update(details)
+            status = self._snapshot()
+        if self.status_file:
+            self._write(status)
+
+    def _write(self, status):
+        tmp = self.status_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp, self.status_file)
+
+    def _snapshot(self):
+        return {"state": self.state, "since": self.since, **self.details}
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot()
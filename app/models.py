@@ -0,0 +1,221 @@
+import os
+import sys
+import glob
+import time
+import cv2
+import numpy as np
+
+from utils import preprocess_nanodet
+from resources import session_options
+
+# Where built variants are cached and where recorded frames for calibration live
+MODELS_DIR = "models"
+CALIBRATION_DIR = "recordings"
+
+MODEL_REGISTRY = {
+    "mobilenet_ssd": {
+        "format": "caffe",
+        "prototxt": "MobileNetSSD_deploy.prototxt",
+        "weights": "MobileNetSSD_deploy.caffemodel",
+        "input_size": 300,
+        # cv2.dnn already runs Caffe models on its own optimized CPU backend: no "optimized" variant
+        "variants": ("fp32", "int8"),
+    },
+    "nanodet": {
+        "format": "onnx",
+        "path": "nanodet_api/nanodet.onnx",
+        "input_size": 320,
+    },
+}
+VARIANTS = ("fp32", "optimized", "int8")
+DEFAULT_MODEL = "mobilenet_ssd"
+DEFAULT_VARIANT = "fp32"
+
+# Loaded models, shared by every camera that uses the same (name, variant)
+_loaded = {}
+
+
+def calibration_frames(calib_dir=CALIBRATION_DIR, limit=200):
+    """Return up to `limit` recorded frame paths (jpg/png) used for INT8 calibration and reports."""
+    paths = []
+    for ext in ("*.jpg", "*.jpeg", "*.png"):
+        paths.extend(glob.glob(os.path.join(calib_dir, ext)))
+    paths = sorted(paths)[:limit]
+    if not paths:
+        raise RuntimeError(f"No recorded frames found in '{calib_dir}'. Save some camera snapshots there first.")
+    return paths
+
+
+def optimize_onnx(src, dst, level=None):
+    """Run ORT graph optimizations (ORT_ENABLE_ALL by default) once and save the optimized model to `dst`."""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = level or ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.optimized_model_filepath = dst
+    ort.InferenceSession(src, options, providers=["CPUExecutionProvider"])
+
+
+def quantize_onnx_int8(src, dst, frame_paths, input_size):
+    """Statically quantize an ONNX model to INT8 (QDQ), calibrated on recorded frames."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    input_name = ort.InferenceSession(src, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(frame_paths)
+
+        def get_next(self):
+            for path in self.paths:
+                img = cv2.imread(path)
+                if img is not None:
+                    return {input_name: preprocess_nanodet(img, input_size)[np.newaxis]}
+            return None
+
+    prepared = dst + ".pre.onnx"
+    quant_pre_process(src, prepared, skip_symbolic_shape=True)
+    try:
+        quantize_static(prepared, dst, FrameReader(),
+                        quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8,
+                        per_channel=True)
+    finally:
+        if os.path.exists(prepared):
+            os.remove(prepared)
+
+
+def variant_path(name, variant):
+    return os.path.join(MODELS_DIR, f"{name}.{variant}.onnx")
+
+
+def model_variants(name):
+    """Variants that exist for model `name`."""
+    return MODEL_REGISTRY[name].get("variants", VARIANTS)
+
+
+def check_variant(name, variant):
+    if variant not in model_variants(name):
+        raise ValueError(f"Unknown variant '{variant}' for {name}, expected one of {model_variants(name)}")
+
+
+def build_variant(name, variant, calib_dir=CALIBRATION_DIR, force=False):
+    """
+    Produce (or reuse the cached) model file for `variant`.
+
+    Returns the path of the ONNX file to load. Caffe models are not rewritten on disk,
+    their variants are applied when loading, so None is returned for them.
+    """
+    spec = MODEL_REGISTRY[name]
+    check_variant(name, variant)
+    if spec["format"] != "onnx":
+        return None
+    src = spec["path"]
+    if variant == "fp32":
+        return src
+
+    dst = variant_path(name, variant)
+    if not force and os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+        return dst
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    print(f"Building {variant} variant of {name} -> {dst}")
+    if variant == "optimized":
+        optimize_onnx(src, dst)
+    else:
+        quantize_onnx_int8(src, dst, calibration_frames(calib_dir), spec["input_size"])
+    return dst
+
+
+def load_model(name=DEFAULT_MODEL, variant=DEFAULT_VARIANT):
+    """Load a model variant (cv2.dnn_Net or ort.InferenceSession), cached per (name, variant)."""
+    key = (name, variant)
+    if key in _loaded:
+        return _loaded[key]
+
+    spec = MODEL_REGISTRY[name]
+    check_variant(name, variant)
+    if spec["format"] == "caffe":
+        model = cv2.dnn.readNetFromCaffe(spec["prototxt"], spec["weights"])
+        if variant == "int8":
+            # Quantized nets only run on the OpenCV backend
+            model.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            model.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            size = spec["input_size"]
+            images = (cv2.imread(p) for p in calibration_frames())
+            calib = [cv2.dnn.blobFromImage(img, 0.007843, (size, size), 127.5) for img in images if img is not None]
+            if not calib:
+                raise RuntimeError("None of the recorded frames could be read for INT8 calibration.")
+            model = model.quantize(calib, cv2.CV_32F, cv2.CV_32F)
+    else:
+        import onnxruntime as ort
+        path = build_variant(name, variant)
+        options = session_options()
+        if variant == "optimized":
+            # Already optimized offline, don't pay for it again at load time
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        model = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    _loaded[key] = model
+    return model
+
+
+def _matches(boxes, reference, iou_threshold=0.5):
+    """Number of `boxes` overlapping some `reference` box by at least `iou_threshold`."""
+    if len(boxes) == 0 or len(reference) == 0:
+        return 0
+    a, b = boxes[:, None, :], reference[None, :, :]
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    iou = inter / np.maximum(area_a + area_b - inter, 1e-6)
+    return int(np.sum(iou.max(axis=1) >= iou_threshold))
+
+
+def compare_variants(name, calib_dir=CALIBRATION_DIR, limit=200):
+    """
+    Print an accuracy/speed report of every variant of `name` on recorded frames.
+
+    Accuracy is measured against the fp32 model: recall is the share of fp32 person
+    boxes the variant also finds, precision the share of its boxes fp32 agrees with.
+    """
+    from detectors import create_detector
+
+    frames = [f for f in (cv2.imread(p) for p in calibration_frames(calib_dir, limit)) if f is not None]
+    reference = None
+    print(f"{name} on {len(frames)} frames from '{calib_dir}'")
+    print(f"{'variant':<10} {'load (s)':>9} {'ms/frame':>9} {'persons':>8} {'recall':>7} {'precision':>9}")
+    for variant in model_variants(name):
+        _loaded.pop((name, variant), None)
+        detector = create_detector(name, variant)
+        start = time.perf_counter()
+        detector.model
+        load_time = time.perf_counter() - start
+
+        detector.detect_one(frames[0])  # warm-up
+        start = time.perf_counter()
+        results = [detector.detect_one(f)[:, :4] for f in frames]
+        ms = (time.perf_counter() - start) / len(frames) * 1000
+
+        if reference is None:
+            reference = results
+        ref_total = sum(len(r) for r in reference)
+        total = sum(len(r) for r in results)
+        recall = sum(_matches(r, b) for r, b in zip(reference, results)) / max(ref_total, 1)
+        precision = sum(_matches(b, r) for r, b in zip(reference, results)) / max(total, 1)
+        print(f"{variant:<10} {load_time:>9.2f} {ms:>9.2f} {total:>8} {recall:>7.2f} {precision:>9.2f}")
+
+
+if __name__ == "__main__":
+    # python models.py build <model> <variant>
+    # python models.py report <model> [recordings_dir]
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        print(build_variant(sys.argv[2], sys.argv[3], force=True) or "Caffe variants are applied at load time.")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "report":
+        compare_variants(sys.argv[2], *sys.argv[3:4])
+    else:
+        print("Usage: python models.py build <model> <variant> | python models.py report <model> [recordings_dir]")
@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+import threading
+
+from utils import draw_person_boxes
+
+
+class MosaicRenderer:
+    """
+    Persistent replacement for `arrange_frames` used by the live view.
+
+    The canvas and the camera labels are built once per layout (number of frames,
+    tile size and camera names). Every call to `render` then only resizes each frame
+    straight into its slice of the canvas and stamps the pre-rendered label on top,
+    so the steady state allocates nothing.
+    """
+
+    def __init__(self, frame_size=(320, 240)):
+        self.frame_size = frame_size
+        self.layout = None
+        self.canvas = None
+        self.tiles = []
+        self.labels = []
+
+    def _build(self, layout, cams):
+        num_frames = len(cams)
+        tile_w, tile_h = self.frame_size
+        # No cameras (e.g. all removed by a reload) still gives one black tile
+        cols = max(1, int(np.ceil(np.sqrt(num_frames))))
+        rows = max(1, int(np.ceil(num_frames / cols)))
+        self.canvas = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+
+        self.tiles = []
+        self.labels = []
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        for idx in range(num_frames):
+            row, col = divmod(idx, cols)
+            y, x = row * tile_h, col * tile_w
+            self.tiles.append(self.canvas[y:y + tile_h, x:x + tile_w])
+
+            # Render the label once into a small patch + mask, same look as add_text
+            text = f"{cams[idx].get('name', 'Cam Undefined')}"
+            (text_w, text_h), baseline = cv2.getTextSize(text, font, 1, 2)
+            label_w = min(tile_w, 10 + text_w + 2)
+            label_h = min(tile_h, 30 + baseline + 2)
+            mask = np.zeros((label_h, label_w), dtype=np.uint8)
+            cv2.putText(mask, text, (10, 30), font, 1, 255, 2, cv2.LINE_AA)
+            patch = np.zeros((label_h, label_w, 3), dtype=np.uint8)
+            patch[:] = (0, 255, 0)
+            self.labels.append((patch, mask, self.tiles[idx][:label_h, :label_w]))
+        self.layout = layout
+
+    def render(self, frames, cams, overlays=None):
+        """
+        Draw `frames` into the persistent canvas and return it (valid until the next call).
+        `overlays` holds optional (K, 5) person detections per frame, in frame coordinates;
+        they are drawn on the tiles, the frames themselves are never written to.
+        """
+        layout = (len(frames), self.frame_size, tuple(c.get('name') for c in cams))
+        if layout != self.layout:
+            self._build(layout, cams)
+
+        for idx, frame in enumerate(frames):
+            tile = self.tiles[idx]
+            if frame is None or not isinstance(frame, np.ndarray):
+                tile[:] = 0
+            else:
+                cv2.resize(frame, self.frame_size, dst=tile)
+                if overlays is not None and overlays[idx] is not None and len(overlays[idx]):
+                    h, w = frame.shape[:2]
+                    scale = np.array([tile.shape[1] / w, tile.shape[0] / h] * 2 + [1], dtype=np.float32)
+                    draw_person_boxes(tile, overlays[idx] * scale)
+            patch, mask, roi = self.labels[idx]
+            cv2.copyTo(patch, mask, dst=roi)
+        return self.canvas
+
+
+class DisplayThread:
+    """
+    Owns the HighGUI window so `imshow`/`waitKey` never run on the detection thread.
+
+    `show` copies the mosaic into a buffer owned by this thread and returns at once;
+    the thread repaints the latest buffer and watches for 'q'.
+    """
+
+    def __init__(self, window_name="Frame", delay=30):
+        self.window_name = window_name
+        self.delay = delay
+        self.buffer = None
+        self.has_new = False
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.quit_requested = threading.Event()
+        self.window_open = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def show(self, image):
+        """Hand a new mosaic to the display thread."""
+        with self.lock:
+            if self.buffer is None or self.buffer.shape != image.shape:
+                self.buffer = np.empty_like(image)
+            np.copyto(self.buffer, image)
+            self.has_new = True
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                if self.has_new:
+                    cv2.imshow(self.window_name, self.buffer)
+                    self.has_new = False
+                    self.window_open = True
+            if cv2.waitKey(self.delay) == ord("q"):
+                self.quit_requested.set()
+        if self.window_open:
+            cv2.destroyWindow(self.window_name)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,47 @@
+import time
+import cv2
+
+
+class StreamPacer:
+    """
+    Paces the capture loop by stream timestamps instead of GUI waits.
+
+    `mark(cap)` is called after each grab and compares how far the stream has advanced
+    (CAP_PROP_POS_MSEC) with the wall-clock time elapsed since the camera was first seen.
+    `delay()` is how long the loop may sleep before every camera is due again: it is only
+    positive when all cameras are ahead of real time (video files, bursts of buffered
+    frames). Live streams block in `grab` and are never slept on; a camera that falls
+    more than `max_lag` behind is re-anchored so it doesn't trigger a catch-up burst.
+    """
+
+    def __init__(self, max_sleep=0.5, max_lag=1.0):
+        self.max_sleep = max_sleep
+        self.max_lag = max_lag
+        self.anchors = {}  # cap -> (stream seconds, monotonic time)
+        self.due = {}  # cap -> monotonic time at which its last grabbed frame is due
+
+    def mark(self, cap):
+        position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        now = time.monotonic()
+        if position <= 0:
+            # No timestamps from this backend; let grab() do the pacing
+            self.due.pop(cap, None)
+            return
+        anchor = self.anchors.get(cap)
+        if anchor is None or position < anchor[0]:
+            # First frame, or the stream restarted / looped
+            anchor = self.anchors[cap] = (position, now)
+        due = anchor[1] + (position - anchor[0])
+        if now - due > self.max_lag:
+            self.anchors[cap] = (position, now)
+            due = now
+        self.due[cap] = due
+
+    def forget(self, cap):
+        self.anchors.pop(cap, None)
+        self.due.pop(cap, None)
+
+    def delay(self):
+        if not self.due:
+            return 0.0
+        return min(max(min(self.due.values()) - time.monotonic(), 0.0), self.max_sleep)
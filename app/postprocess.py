@@ -0,0 +1,97 @@
+import math
+import threading
+import cv2
+import numpy as np
+
+# Postprocessors are cached per thread since they own scratch buffers
+_postprocessors = threading.local()
+
+
+def stable_sigmoid(x):
+    """Sigmoid that never overflows: exp is only taken of non-positive values."""
+    e = np.exp(-np.abs(x))
+    return np.where(x >= 0, 1 / (1 + e), e / (1 + e))
+
+
+class NanoDetPostprocessor:
+    """
+    Decodes raw NanoDet output for a whole batch in one vectorized pass.
+
+    Input is the (B, N, C + 4 * (reg_max + 1)) tensor (class logits, then the
+    distribution of each box side over reg_max + 1 bins) for the N center priors of
+    `strides`. The class max/argmax is taken on the logits into preallocated buffers,
+    and the score threshold is applied there as its logit, so the sigmoid and the box
+    decoding only run on the few priors that pass. NMS is class agnostic per image and
+    done for the whole batch in one call, with boxes of different images kept apart.
+    """
+
+    def __init__(self, input_size=320, reg_max=7, strides=(8, 16, 32)):
+        self.input_size = input_size
+        self.reg_max = reg_max
+        self.bins = np.arange(reg_max + 1, dtype=np.float32)
+        priors = []
+        for stride in strides:
+            size = input_size // stride
+            y, x = np.mgrid[:size, :size]
+            priors.append(np.stack([x.ravel() * stride, y.ravel() * stride], axis=1))
+        self.centers = np.concatenate(priors).astype(np.float32)  # (N, 2) in input pixels
+        self.max_logits = None
+        self.labels = None
+
+    def __call__(self, outputs, score_thresh=0.5, nms_thresh=0.6):
+        """
+        Returns (boxes, labels, scores, image_index) for all images of the batch, ordered by
+        image: boxes are (M, 4) x1, y1, x2, y2 in input space and image_index tells which
+        image of the batch each detection belongs to.
+        """
+        if outputs.ndim == 2:
+            outputs = outputs[np.newaxis]
+        batch, num_priors, channels = outputs.shape
+        num_classes = channels - 4 * (self.reg_max + 1)
+        if self.max_logits is None or self.max_logits.shape != (batch, num_priors):
+            self.max_logits = np.empty((batch, num_priors), dtype=np.float32)
+            self.labels = np.empty((batch, num_priors), dtype=np.intp)
+
+        cls_logits = outputs[:, :, :num_classes]
+        np.max(cls_logits, axis=2, out=self.max_logits)
+        if score_thresh <= 0:
+            logit_thresh = -np.inf
+        elif score_thresh >= 1:
+            logit_thresh = np.inf
+        else:
+            logit_thresh = math.log(score_thresh / (1 - score_thresh))  # sigmoid(x) > t  <=>  x > logit(t)
+        image_index, prior_index = np.nonzero(self.max_logits > logit_thresh)
+        if image_index.size == 0:
+            return (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.intp),
+                    np.zeros(0, dtype=np.float32), image_index)
+        np.argmax(cls_logits, axis=2, out=self.labels)
+        scores = stable_sigmoid(self.max_logits[image_index, prior_index])
+        labels = self.labels[image_index, prior_index]
+
+        # Distribution focal loss decoding: softmax over the bins, expected value per side
+        reg = outputs[image_index, prior_index, num_classes:].reshape(-1, 4, self.reg_max + 1)
+        reg = np.exp(reg - reg.max(axis=2, keepdims=True))
+        distances = (reg @ self.bins) / reg.sum(axis=2)
+        centers = self.centers[prior_index]
+        boxes = np.empty((len(prior_index), 4), dtype=np.float32)
+        boxes[:, :2] = centers - distances[:, :2]
+        boxes[:, 2:] = centers + distances[:, 2:]
+        np.clip(boxes, 0, self.input_size, out=boxes)
+
+        # One NMS call for the batch: shift each image's boxes so they can't overlap another's
+        offset = (image_index * (self.input_size + 1)).astype(np.float32)[:, np.newaxis]
+        rects = np.concatenate([boxes[:, :2] + offset, boxes[:, 2:] - boxes[:, :2]], axis=1)
+        keep = np.asarray(cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), 0.0, nms_thresh), dtype=np.intp).ravel()
+        keep = keep[np.lexsort((-scores[keep], image_index[keep]))]
+        return boxes[keep], labels[keep], scores[keep].astype(np.float32), image_index[keep]
+
+
+def get_postprocessor(input_size=320, reg_max=7, strides=(8, 16, 32)):
+    """Postprocessor for these settings, created once per thread."""
+    cache = getattr(_postprocessors, "cache", None)
+    if cache is None:
+        cache = _postprocessors.cache = {}
+    key = (input_size, reg_max, tuple(strides))
+    if key not in cache:
+        cache[key] = NanoDetPostprocessor(input_size, reg_max, strides)
+    return cache[key]
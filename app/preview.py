@@ -0,0 +1,221 @@
+import cv2
+import numpy as np
+import threading
+import time
+import json
+import html
+from urllib.parse import quote, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOUNDARY = "frame"
+# Sent while a stream has no frame yet, so every wait ends in a write and a viewer
+# that went away is noticed (and stops counting as watching)
+PLACEHOLDER_JPEG = cv2.imencode(".jpg", np.zeros((240, 320, 3), dtype=np.uint8))[1].tobytes()
+
+
+class PreviewStream:
+    """
+    Latest frame of one preview stream plus its lazily encoded JPEG.
+
+    `publish` only copies into a buffer owned by the stream, and only while at least
+    one viewer is connected. It fills a spare buffer and swaps it in, so it never waits
+    for an encode and never overwrites the frame being encoded. The JPEG is encoded
+    (outside the lock) by the first viewer that asks for a new version and reused by
+    every other viewer, so the encode cost is paid once per frame no matter how many
+    people are watching.
+    """
+
+    def __init__(self, jpeg_quality=80):
+        self.jpeg_quality = jpeg_quality
+        self.buffer = None
+        self.spare = None
+        self.encoding = None  # buffer a viewer is encoding right now
+        self.version = 0
+        self.jpeg = None
+        self.jpeg_version = -1
+        self.viewers = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def close(self):
+        """The stream's camera is gone: end the connections of its viewers."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def publish(self, frame):
+        with self.cond:
+            if self.viewers == 0:
+                return
+            buffer, self.spare = self.spare, None
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        with self.cond:
+            previous, self.buffer = self.buffer, buffer
+            if previous is not None and previous is not self.encoding:
+                self.spare = previous
+            self.version += 1
+            self.cond.notify_all()
+
+    def next_jpeg(self, last_version, timeout=5):
+        """
+        Block until a frame newer than `last_version` exists; return (version, jpeg bytes).
+
+        On timeout the previous JPEG is returned again (None if there never was a frame),
+        which doubles as a keep-alive that lets the server notice viewers that went away
+        while the stream was idle.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.version > last_version or self.closed, timeout)
+            if self.version <= last_version:
+                return last_version, self.jpeg
+            # Another viewer may be encoding already; its JPEG can be reused
+            self.cond.wait_for(lambda: self.encoding is None or self.jpeg_version == self.version, timeout)
+            if self.jpeg_version == self.version or self.encoding is not None:
+                return self.jpeg_version, self.jpeg
+            buffer, version = self.buffer, self.version
+            self.encoding = buffer
+
+        ok, encoded = cv2.imencode(".jpg", buffer, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        with self.cond:
+            self.encoding = None
+            if ok and version > self.jpeg_version:
+                self.jpeg = encoded.tobytes()
+                self.jpeg_version = version
+            if buffer is not self.buffer and self.spare is None:
+                self.spare = buffer
+            self.cond.notify_all()
+            return self.jpeg_version, self.jpeg
+
+
+class PreviewServer:
+    """
+    Built-in MJPEG over HTTP preview, an alternative to cv2.imshow for headless boxes.
+    There is no authentication: it listens on localhost by default, and exposing it on
+    another interface (host="0.0.0.0") publishes every camera to that network.
+
+    Streams:
+        /                 index page
+        /mosaic.mjpg      the camera grid
+        /cam/<name>.mjpg  the camera with that (URL-encoded) name in data.json
+        /healthz          readiness as JSON: 200 once ready, 503 while starting or stopping
+    """
+
+    def __init__(self, port=8080, host="127.0.0.1", max_fps=10, readiness=None):
+        self.readiness = readiness
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        self.streams = {}
+        self.streams_lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    def stream(self, name):
+        with self.streams_lock:
+            if name not in self.streams:
+                self.streams[name] = PreviewStream()
+            return self.streams[name]
+
+    def remove_stream(self, name):
+        with self.streams_lock:
+            stream = self.streams.pop(name, None)
+        if stream is not None:
+            stream.close()
+
+    def is_watched(self, name):
+        """True if at least one viewer is connected to `name`; lets the caller skip work."""
+        stream = self.streams.get(name)
+        return stream is not None and stream.viewers > 0
+
+    def publish(self, name, frame):
+        stream = self.streams.get(name)
+        if stream is not None and frame is not None:
+            stream.publish(frame)
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Preview server listening on http://{self.host}:{self.port}/")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _handler(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/":
+                    self.send_index()
+                elif self.path == "/healthz":
+                    self.send_health()
+                elif self.path == "/mosaic.mjpg":
+                    self.send_mjpeg("mosaic")
+                elif self.path.startswith("/cam/") and self.path.endswith(".mjpg"):
+                    self.send_mjpeg("cam/" + unquote(self.path[len("/cam/"):-len(".mjpg")]))
+                else:
+                    self.send_error(404)
+
+            def send_index(self):
+                with preview.streams_lock:
+                    cams = sorted(n[len("cam/"):] for n in preview.streams if n.startswith("cam/"))
+                links = "".join(f'<li><a href="/cam/{quote(c, safe="")}.mjpg">{html.escape(c)}</a></li>' for c in cams)
+                body = (f'<html><body><img src="/mosaic.mjpg"><ul>{links}</ul></body></html>').encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_health(self):
+                readiness = preview.readiness
+                status = readiness.snapshot() if readiness is not None else {"state": "ready"}
+                body = json.dumps(status).encode()
+                self.send_response(200 if status["state"] == "ready" else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_mjpeg(self, name):
+                with preview.streams_lock:
+                    stream = preview.streams.get(name)
+                if stream is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+
+                with stream.cond:
+                    stream.viewers += 1
+                version = stream.version
+                min_interval = 1.0 / preview.max_fps
+                try:
+                    while not stream.closed:
+                        version, jpeg = stream.next_jpeg(version)
+                        if jpeg is None:
+                            jpeg = PLACEHOLDER_JPEG
+                        self.wfile.write(f"--{BOUNDARY}\r\n".encode())
+                        self.wfile.write(b"Content-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                        time.sleep(min_interval)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stream.cond:
+                        stream.viewers -= 1
+
+        return Handler
@@ -0,0 +1,85 @@
+import os
+import cv2
+
+# One place for CPU resources, read from the "resources" object of data.json and
+# overridden by environment variables. Unset values keep each library's own default.
+#   cpu_affinity          CPU_AFFINITY          cores to pin the process (and its threads) to, e.g. "0-3" or "0,2"
+#   cv2_threads           CV2_THREADS           cv2.setNumThreads; also used by the cv2.dnn CPU backend
+#   ort_intra_op_threads  ORT_INTRA_OP_THREADS  onnxruntime threads inside one operator
+#   ort_inter_op_threads  ORT_INTER_OP_THREADS  onnxruntime threads across independent operators
+#   preprocess_workers    PREPROCESS_WORKERS    NanoDet decode/resize pool (utils.get_preprocess_pool)
+RESOURCE_ENV = {
+    "cpu_affinity": "CPU_AFFINITY",
+    "cv2_threads": "CV2_THREADS",
+    "ort_intra_op_threads": "ORT_INTRA_OP_THREADS",
+    "ort_inter_op_threads": "ORT_INTER_OP_THREADS",
+    "preprocess_workers": "PREPROCESS_WORKERS",
+}
+
+# Settings currently in effect, filled by apply_resources
+current = {key: None for key in RESOURCE_ENV}
+
+
+def parse_cpus(value):
+    """'0-3,6' -> {0, 1, 2, 3, 6}."""
+    cpus = set()
+    for part in str(value).split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def resolve_resources(settings=None):
+    """Merge the data.json "resources" object with the environment (environment wins)."""
+    resolved = dict((settings or {}).get("resources", {}))
+    for key, env in RESOURCE_ENV.items():
+        if os.getenv(env):
+            resolved[key] = os.getenv(env)
+    for key in RESOURCE_ENV:
+        if key != "cpu_affinity" and resolved.get(key) is not None:
+            resolved[key] = int(resolved[key])
+    return {key: resolved.get(key) for key in RESOURCE_ENV}
+
+
+def apply_resources(settings=None):
+    """
+    Apply the resource settings to this process. Call it at startup, before models are
+    loaded and worker threads are started: threads inherit the affinity of their creator
+    and onnxruntime reads its thread counts when a session is created.
+    """
+    current.update(resolve_resources(settings))
+    if current["cpu_affinity"] is not None:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, parse_cpus(current["cpu_affinity"]))
+        else:
+            print("CPU affinity is not supported on this platform, ignoring cpu_affinity.")
+    if current["cv2_threads"] is not None:
+        cv2.setNumThreads(current["cv2_threads"])
+    applied = {key: value for key, value in current.items() if value is not None}
+    if applied:
+        print("Resource settings:", applied)
+    return current
+
+
+def available_cpus():
+    """Number of cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def session_options():
+    """onnxruntime SessionOptions carrying the configured thread counts."""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    if current["ort_intra_op_threads"] is not None:
+        options.intra_op_num_threads = current["ort_intra_op_threads"]
+    if current["ort_inter_op_threads"] is not None:
+        options.inter_op_num_threads = current["ort_inter_op_threads"]
+        if current["ort_inter_op_threads"] > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return options
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+from utils import draw_person_boxes
+
+
+def main_stream_link(camera_info):
+    """
+    Full-resolution stream of a camera: its "snapshot_link" in data.json, or for
+    Dahua-style links the same URL with the sub-stream (subtype=1) swapped for the
+    main stream (subtype=0). None when there is no better stream to ask.
+    """
+    link = camera_info.get("snapshot_link")
+    if link:
+        return link
+    link = camera_info.get("link")
+    if isinstance(link, str) and "subtype=1" in link:
+        return link.replace("subtype=1", "subtype=0")
+    return None
+
+
+class SnapshotGrabber:
+    """
+    Fetches sharp evidence images for alerts from the cameras' main streams.
+
+    Detection keeps running on the cheap sub-stream; when an alert fires, `request`
+    returns at once and a worker opens the main stream, decodes its first frame (a
+    keyframe, the decoder starts from one), draws the detections scaled to that
+    resolution and hands the image to `callback(timestamp, camera_info, image)`.
+    If the main stream can't be read within `timeout` seconds, or a grab for the same
+    camera is still running, the analysed frame is passed on instead.
+    `frame` and `detections` are handed over as is and must not be modified by the caller.
+    """
+
+    def __init__(self, timeout=5, workers=2):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot")
+        self.busy = set()
+        self.lock = threading.Lock()
+
+    def request(self, timestamp, camera_info, frame, detections, callback):
+        link = main_stream_link(camera_info)
+        with self.lock:
+            if link is None or link in self.busy:
+                link = None
+            else:
+                self.busy.add(link)
+        if link is None:
+            callback(timestamp, camera_info, frame)
+            return
+        self.executor.submit(self._grab, link, timestamp, camera_info, frame, detections, callback)
+
+    def _grab(self, link, timestamp, camera_info, frame, detections, callback):
+        image = None
+        try:
+            image = self.read_keyframe(link)
+            if image is None:
+                print(f"No snapshot from main stream of {camera_info.get('name', link)}, using the analysed frame.")
+            else:
+                h, w = frame.shape[:2]
+                H, W = image.shape[:2]
+                scaled = detections.copy()
+                scaled[:, [0, 2]] *= W / w
+                scaled[:, [1, 3]] *= H / h
+                draw_person_boxes(image, scaled)
+        except Exception as e:
+            print("Error grabbing snapshot:", e)
+            image = None
+        finally:
+            with self.lock:
+                self.busy.discard(link)
+        callback(timestamp, camera_info, image if image is not None else frame)
+
+    def read_keyframe(self, link, attempts=3):
+        timeout_ms = int(self.timeout * 1000)
+        cap = cv2.VideoCapture(link, cv2.CAP_FFMPEG,
+                               [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms])
+        try:
+            if not cap.isOpened():
+                return None
+            for _ in range(attempts):
+                ret, image = cap.read()
+                if ret:
+                    return image
+            return None
+        finally:
+            cap.release()
+
+    def stop(self):
+        """Wait for the grabs in progress so their alerts are still submitted."""
+        self.executor.shutdown(wait=True)
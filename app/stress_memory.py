@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+from utils import draw_person_boxes
+from alerts import AlertAggregator
+from alert_queue import DiskAlertQueue
+from mosaic import MosaicRenderer
+from snapshots import SnapshotGrabber
+
+# Memory under an alert storm: every camera raises an alert on every pass while the
+# alert channel is down (nothing consumes the spool), so backpressure has to kick in.
+# Frames follow the same lifecycle as detect(): reused decode buffers, one annotated
+# copy per alert, detections drawn on the mosaic overlay. RSS should stay flat.
+# Usage: python stress_memory.py [seconds] [cameras]
+
+FRAME_SHAPE = (1080, 1920, 3)
+WARM_UP = 3  # seconds before the RSS baseline is taken
+
+
+def rss_mb():
+    """Current resident set size (Linux), or the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class SyntheticCamera:
+    """Stands in for cv2.VideoCapture: `retrieve(image)` decodes into `image` when it fits."""
+
+    def __init__(self, rng):
+        self.templates = [rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8) for _ in range(2)]
+        self.count = 0
+
+    def retrieve(self, image=None):
+        self.count += 1
+        template = self.templates[self.count % 2]
+        if image is None or image.shape != template.shape:
+            image = np.empty_like(template)
+        np.copyto(image, template)
+        return True, image
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    num_cams = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    rng = np.random.default_rng(0)
+    caps = [SyntheticCamera(rng) for _ in range(num_cams)]
+    cams = [{"name": f"cam{i + 1}", "link": f"synthetic{i}"} for i in range(num_cams)]
+    frames = [None] * num_cams
+    overlays = [None] * num_cams
+    detections = np.array([[400, 200, 700, 900, 0.9]], dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        spool = DiskAlertQueue(spool_dir, max_pending=20, put_timeout=1)
+        aggregator = AlertAggregator(window=0.2, rate_limits={"email": (10 ** 9, 1)})
+        aggregator.channels = {"email": (lambda: ["stress@example.com"], spool.put)}
+        aggregator.start()
+        grabber = SnapshotGrabber()
+        renderer = MosaicRenderer()
+
+        start = time.monotonic()
+        baseline = None
+        alerts = passes = 0
+        next_report = start + 1
+        print(f"{'t (s)':>6} {'RSS (MB)':>9} {'alerts':>8} {'spooled':>8}")
+        while time.monotonic() - start < duration:
+            for idx, cap in enumerate(caps):
+                ret, frames[idx] = cap.retrieve(frames[idx])
+                overlays[idx] = detections
+                evidence = draw_person_boxes(frames[idx].copy(), detections)
+                grabber.request(str(passes), cams[idx], evidence, detections, aggregator.submit)
+                alerts += 1
+            renderer.render(frames, cams, overlays)
+            passes += 1
+
+            now = time.monotonic()
+            if now >= next_report:
+                rss = rss_mb()
+                if baseline is None and now - start >= WARM_UP:
+                    baseline = rss
+                print(f"{now - start:>6.0f} {rss:>9.1f} {alerts:>8} {len(spool):>8}")
+                next_report += 1
+
+        grabber.stop()
+        aggregator.stop()
+        final = rss_mb()
+        print(f"{passes} passes, {alerts} alerts raised, {len(spool)} spooled (limit {spool.max_pending}).")
+        if baseline is not None:
+            print(f"RSS after warm-up {baseline:.1f} MB, at the end {final:.1f} MB ({final - baseline:+.1f} MB).")
@@ -1,43 +1,82 @@
 import cv2
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
 import os
+import sys
 import numpy as np
 from json import load
 import time
 import threading
-import queue
+from alert_queue import DiskAlertQueue
+from postprocess import get_postprocessor
+from config_watcher import parse_config
+import resources
 # import pywhatkit as kit
-import onnxruntime as ort
 
-from whatnot import send_whatsapp_message
+# onnxruntime, smtplib/email and Selenium (whatnot) are imported where they are used,
+# so importing utils stays cheap and has no side effects.
 
-# Create a queue for email tasks
-email_queue = queue.Queue()
+# Alerts are spooled to disk, one queue and worker thread per channel, so they
+# survive crashes and SMTP/WhatsApp outages (see alert_queue.DiskAlertQueue)
+ALERT_SPOOL_DIR = "alert-spool"
+ALERT_CHANNELS = ("email", "whatsapp")
+alert_queues = {}
+alert_threads = {}
+alert_lock = threading.Lock()
 
 
-def email_worker():
-    """Worker function to process email tasks from the queue."""
+def get_alert_queue(channel):
+    with alert_lock:
+        if channel not in alert_queues:
+            alert_queues[channel] = DiskAlertQueue(os.path.join(ALERT_SPOOL_DIR, channel))
+        return alert_queues[channel]
+
+
+def alert_worker(channel):
+    """Worker function sending the spooled alerts of one channel, oldest first."""
+    alert_queue = get_alert_queue(channel)
     while True:
-        task = email_queue.get()
-        if task is None:  # Exit signal
+        task = alert_queue.get()
+        if task is None:  # Queue closed
             break
+        seq, timestamp, camera_info, frame, recipients = task
+        # Recipients still to be sent to: [] when delivered, None to retry all of them
         try:
-            send_email_alert(*task)
+            if channel == "whatsapp":
+                failed = whatsapp_alert_failures(timestamp, camera_info, frame, recipients)
+            else:
+                failed = [] if send_email_alert(timestamp, camera_info, frame, recipients) else None
         except Exception as e:
-            print("Error sending email:", e)
-        email_queue.task_done()
+            print(f"Error sending {channel} alert:", e)
+            failed = None
+        if failed == []:
+            alert_queue.ack(seq)
+        else:
+            # Only the recipients that didn't get it are retried
+            alert_queue.nack(seq, recipients=failed)
+
+def start_alert_workers(channels=ALERT_CHANNELS):
+    """Start the alert worker threads that are not running yet; alerts left on disk are replayed."""
+    for channel in channels:
+        get_alert_queue(channel)
+        with alert_lock:
+            thread = alert_threads.get(channel)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=alert_worker, args=(channel,), daemon=True)
+                alert_threads[channel] = thread
+                thread.start()
+
 
-# Start the email worker thread
-email_thread = threading.Thread(target=email_worker, daemon=True)
-email_thread.start()
+def queue_alert(channel, timestamp, camera_info, frame, recipients=None):
+    """Spool an alert for `channel`, starting its worker on first use. Blocks while the spool is full."""
+    start_alert_workers([channel])
+    return get_alert_queue(channel).put(timestamp, camera_info, frame, recipients)
 
-def queue_email_alert(timestamp, camera_info, frame):
-    """Add an email alert task to the queue."""
-    email_queue.put((timestamp, camera_info, frame))
+
+def queue_email_alert(timestamp, camera_info, frame, receiver_emails=None):
+    return queue_alert("email", timestamp, camera_info, frame, receiver_emails)
+
+
+def queue_whatsapp_alert(timestamp, camera_info, frame, phone_nums=None):
+    return queue_alert("whatsapp", timestamp, camera_info, frame, phone_nums)
 
 
 def run_nanodet_onnx(image_path, model_path="nanodet_api/nanodet.onnx", score_thresh=0.5, nms_thresh=0.6):
@@ -49,239 +88,180 @@ def run_nanodet_onnx(image_path, model_path="nanodet_api/nanodet.onnx", score_th
         score_thresh (float): Detection score threshold.
         nms_thresh (float): NMS IoU threshold.
     Returns:
-        dict: Detection results with 'boxes', 'labels', 'scores'.
+        dict: Detection results with 'boxes' (in image coordinates), 'labels', 'scores'.
     """
-    # Preprocess
-    INPUT_SIZE = 320
-    REG_MAX = 7
-    STRIDES = [8, 16, 32]
-    img = cv2.imread(image_path)
-    img = cv2.resize(img, (INPUT_SIZE, INPUT_SIZE))
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    img = img.astype(np.float32) / 255.0
-    img = np.transpose(img, (2, 0, 1))
-    img = np.expand_dims(img, axis=0).astype(np.float32)
-
-    # Inference
-    session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
-    input_name = session.get_inputs()[0].name
-    outputs = session.run(None, {input_name: img})
-    outputs = outputs[0] if isinstance(outputs, (list, tuple)) else outputs
-    if outputs.ndim == 3:
-        outputs = outputs[0]
-    NUM_CLASSES = 80  # Change this if your model uses a different number of classes
-
-    # Generate center priors
-    center_priors = []
-    for stride in STRIDES:
-        feat_w = INPUT_SIZE // stride
-        feat_h = INPUT_SIZE // stride
-        for y in range(feat_h):
-            for x in range(feat_w):
-                center_priors.append([x, y, stride])
-    center_priors = np.array(center_priors, dtype=np.float32)
-
-    # Postprocess
-    cls_logits = outputs[:, :NUM_CLASSES]
-    bbox_pred = outputs[:, NUM_CLASSES:]
-    scores = 1 / (1 + np.exp(-cls_logits))  # sigmoid
-    labels = np.argmax(scores, axis=1)
-    scores = np.max(scores, axis=1)
-    keep = scores > score_thresh
-    if not np.any(keep):
-        return {"boxes": [], "labels": [], "scores": []}
-    scores = scores[keep]
-    labels = labels[keep]
-    bbox_pred = bbox_pred[keep]
-    center_priors = center_priors[keep]
-    bbox_pred = bbox_pred.reshape(-1, 4, REG_MAX + 1)
-    bbox_pred = np.exp(bbox_pred - np.max(bbox_pred, axis=2, keepdims=True))
-    bbox_pred = bbox_pred / np.sum(bbox_pred, axis=2, keepdims=True)
-    dis = np.dot(bbox_pred, np.arange(REG_MAX + 1, dtype=np.float32))
-    def distance2bbox(center, distance, max_shape=None):
-        x1 = center[:, 0] * center[:, 2] - distance[:, 0]
-        y1 = center[:, 1] * center[:, 2] - distance[:, 1]
-        x2 = center[:, 0] * center[:, 2] + distance[:, 2]
-        y2 = center[:, 1] * center[:, 2] + distance[:, 3]
-        if max_shape is not None:
-            x1 = np.clip(x1, 0, max_shape[1])
-            y1 = np.clip(y1, 0, max_shape[0])
-            x2 = np.clip(x2, 0, max_shape[1])
-            y2 = np.clip(y2, 0, max_shape[0])
-        return np.stack([x1, y1, x2, y2], axis=-1)
-    boxes = distance2bbox(center_priors, dis, max_shape=(INPUT_SIZE, INPUT_SIZE))
-    # NMS
-    def nms(boxes, scores, iou_threshold):
-        idxs = scores.argsort()[::-1]
-        keep = []
-        while idxs.size > 0:
-            i = idxs[0]
-            keep.append(i)
-            if idxs.size == 1:
-                break
-            xx1 = np.maximum(boxes[i, 0], boxes[idxs[1:], 0])
-            yy1 = np.maximum(boxes[i, 1], boxes[idxs[1:], 1])
-            xx2 = np.minimum(boxes[i, 2], boxes[idxs[1:], 2])
-            yy2 = np.minimum(boxes[i, 3], boxes[idxs[1:], 3])
-            w = np.maximum(0, xx2 - xx1)
-            h = np.maximum(0, yy2 - yy1)
-            inter = w * h
-            area1 = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
-            area2 = (boxes[idxs[1:], 2] - boxes[idxs[1:], 0]) * (boxes[idxs[1:], 3] - boxes[idxs[1:], 1])
-            ovr = inter / (area1 + area2 - inter)
-            idxs = idxs[1:][ovr < iou_threshold]
-        return keep
-    keep_idx = nms(boxes, scores, nms_thresh)
-    boxes = boxes[keep_idx].tolist()
-    labels = labels[keep_idx].tolist()
-    scores = scores[keep_idx].tolist()
-    return {"boxes": boxes, "labels": labels, "scores": scores}
-
-def run_nanodet_onnx_batch(image_paths, model_path="nanodet_api/nanodet.onnx", score_thresh=0.5, nms_thresh=0.6, batch_size=4):
+    return run_nanodet_onnx_batch([image_path], model_path, score_thresh, nms_thresh, batch_size=1)[0]
+
+# Thread pools decoding/resizing NanoDet inputs (OpenCV and NumPy release the GIL), created on first use
+# and keyed by their number of workers
+preprocess_pools = {}
+preprocess_pool_lock = threading.Lock()
+# Per-thread pair of batch tensors, filled alternately (see run_nanodet_onnx_batch)
+nanodet_buffers = threading.local()
+
+
+def get_preprocess_pool(workers=None):
+    """Shared pool with `workers` threads; by default PREPROCESS_WORKERS, or one per available core."""
+    workers = workers or resources.current["preprocess_workers"] or resources.available_cpus()
+    with preprocess_pool_lock:
+        if workers not in preprocess_pools:
+            from concurrent.futures import ThreadPoolExecutor
+            preprocess_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preprocess")
+        return preprocess_pools[workers]
+
+
+def preprocess_nanodet_into(img, out, input_size=320, letterbox=True):
+    """
+    Resize a BGR image (or read it from a path) into `out`, a preallocated float32 (3, H, W) slot.
+    HWC->CHW is done by cv2.split, then each plane is scaled by 1/255 straight into its RGB slot,
+    so no intermediate float image is allocated.
+
+    With `letterbox` the aspect ratio is kept and the image is centred on a black canvas;
+    otherwise it is stretched. Returns the transform (scale_x, scale_y, pad_x, pad_y, width,
+    height) that `letterbox_to_original` uses to map boxes back onto the image.
+    """
+    if isinstance(img, str):
+        img = cv2.imread(img)
+    if img is None:
+        # Zero image if the file is not found
+        out[:] = 0
+        return (1.0, 1.0, 0, 0, input_size, input_size)
+    h, w = img.shape[:2]
+    if letterbox:
+        scale = min(input_size / w, input_size / h)
+        new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+        pad_x, pad_y = (input_size - new_w) // 2, (input_size - new_h) // 2
+        out[:, :pad_y] = 0
+        out[:, pad_y + new_h:] = 0
+        out[:, :, :pad_x] = 0
+        out[:, :, pad_x + new_w:] = 0
+    else:
+        new_w = new_h = input_size
+        pad_x = pad_y = 0
+    img = cv2.resize(img, (new_w, new_h))
+    target = out[:, pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+    for channel, plane in enumerate(reversed(cv2.split(img))):
+        np.multiply(plane, np.float32(1 / 255.0), out=target[channel], casting='unsafe')
+    return (new_w / w, new_h / h, pad_x, pad_y, w, h)
+
+
+def preprocess_nanodet(img, input_size=320, letterbox=True):
+    """Letterbox (or stretch) a BGR image to the NanoDet input and return it as a float32 CHW RGB array."""
+    out = np.empty((3, input_size, input_size), dtype=np.float32)
+    preprocess_nanodet_into(img, out, input_size, letterbox)
+    return out
+
+
+def letterbox_to_original(boxes, transforms):
+    """
+    Map (M, 4) x1, y1, x2, y2 boxes from model input space back onto their images, all at once.
+    `transforms` holds the matching (M, 6) rows returned by `preprocess_nanodet_into`.
+    """
+    scale = transforms[:, [0, 1, 0, 1]]
+    pad = transforms[:, [2, 3, 2, 3]]
+    size = transforms[:, [4, 5, 4, 5]]
+    return np.clip((boxes - pad) / scale, 0, size)
+
+
+def run_nanodet_onnx_batch(image_paths, model_path="nanodet_api/nanodet.onnx", score_thresh=0.5, nms_thresh=0.6, batch_size=4, session=None, input_size=320, workers=None, letterbox=True):
     """
     Runs NanoDet ONNX inference on multiple images in batches for better efficiency.
     Args:
-        image_paths (list): List of paths to input images.
+        image_paths (list): List of paths to input images, or already decoded BGR frames.
         model_path (str): Path to the ONNX model.
         score_thresh (float): Detection score threshold.
         nms_thresh (float): NMS IoU threshold.
         batch_size (int): Number of images to process in each batch.
+        session (ort.InferenceSession): Reuse an existing session instead of loading model_path.
+        input_size (int): Square model input size.
+        workers (int): 0 preprocesses on the calling thread; otherwise images are decoded and
+            resized on a shared pool of `workers` threads (None: the default pool size, see
+            get_preprocess_pool) while the previous batch is running inference.
+        letterbox (bool): Keep the aspect ratio (padding) instead of stretching to the input size.
     Returns:
-        list: List of detection results, each with 'boxes', 'labels', 'scores'.
+        list: List of detection results, each with 'boxes' (in original image coordinates),
+            'labels', 'scores'.
     """
-    INPUT_SIZE = 320
-    REG_MAX = 7
-    STRIDES = [8, 16, 32]
-    NUM_CLASSES = 80  # Change this if your model uses a different number of classes
-    
-    # Generate center priors (only once)
-    center_priors = []
-    for stride in STRIDES:
-        feat_w = INPUT_SIZE // stride
-        feat_h = INPUT_SIZE // stride
-        for y in range(feat_h):
-            for x in range(feat_w):
-                center_priors.append([x, y, stride])
-    center_priors = np.array(center_priors, dtype=np.float32)
+    INPUT_SIZE = input_size
+    postprocess = get_postprocessor(INPUT_SIZE)
     
     # Initialize ONNX session
-    session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    if session is None:
+        import onnxruntime as ort
+        session = ort.InferenceSession(model_path, resources.session_options(), providers=["CPUExecutionProvider"])
     input_name = session.get_inputs()[0].name
     
-    def preprocess_batch(image_paths_batch):
-        """Preprocess a batch of images."""
-        batch_imgs = []
-        for img_path in image_paths_batch:
-            img = cv2.imread(img_path)
-            if img is None:
-                # Return zero image if file not found
-                img = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
-            img = cv2.resize(img, (INPUT_SIZE, INPUT_SIZE))
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            img = img.astype(np.float32) / 255.0
-            img = np.transpose(img, (2, 0, 1))
-            batch_imgs.append(img)
-        return np.array(batch_imgs, dtype=np.float32)
-    
-    def postprocess_single(outputs, center_priors, score_thresh, nms_thresh):
-        """Postprocess outputs for a single image."""
-        if outputs.ndim == 3:
-            outputs = outputs[0]
-        
-        cls_logits = outputs[:, :NUM_CLASSES]
-        bbox_pred = outputs[:, NUM_CLASSES:]
-        scores = 1 / (1 + np.exp(-cls_logits))  # sigmoid
-        labels = np.argmax(scores, axis=1)
-        scores = np.max(scores, axis=1)
-        keep = scores > score_thresh
-        if not np.any(keep):
-            return {"boxes": [], "labels": [], "scores": []}
-        
-        scores = scores[keep]
-        labels = labels[keep]
-        bbox_pred = bbox_pred[keep]
-        center_priors_keep = center_priors[keep]
-        bbox_pred = bbox_pred.reshape(-1, 4, REG_MAX + 1)
-        bbox_pred = np.exp(bbox_pred - np.max(bbox_pred, axis=2, keepdims=True))
-        bbox_pred = bbox_pred / np.sum(bbox_pred, axis=2, keepdims=True)
-        dis = np.dot(bbox_pred, np.arange(REG_MAX + 1, dtype=np.float32))
-        
-        def distance2bbox(center, distance, max_shape=None):
-            x1 = center[:, 0] * center[:, 2] - distance[:, 0]
-            y1 = center[:, 1] * center[:, 2] - distance[:, 1]
-            x2 = center[:, 0] * center[:, 2] + distance[:, 2]
-            y2 = center[:, 1] * center[:, 2] + distance[:, 3]
-            if max_shape is not None:
-                x1 = np.clip(x1, 0, max_shape[1])
-                y1 = np.clip(y1, 0, max_shape[0])
-                x2 = np.clip(x2, 0, max_shape[1])
-                y2 = np.clip(y2, 0, max_shape[0])
-            return np.stack([x1, y1, x2, y2], axis=-1)
-        
-        boxes = distance2bbox(center_priors_keep, dis, max_shape=(INPUT_SIZE, INPUT_SIZE))
-        
-        # NMS
-        def nms(boxes, scores, iou_threshold):
-            idxs = scores.argsort()[::-1]
-            keep = []
-            while idxs.size > 0:
-                i = idxs[0]
-                keep.append(i)
-                if idxs.size == 1:
-                    break
-                xx1 = np.maximum(boxes[i, 0], boxes[idxs[1:], 0])
-                yy1 = np.maximum(boxes[i, 1], boxes[idxs[1:], 1])
-                xx2 = np.minimum(boxes[i, 2], boxes[idxs[1:], 2])
-                yy2 = np.minimum(boxes[i, 3], boxes[idxs[1:], 3])
-                w = np.maximum(0, xx2 - xx1)
-                h = np.maximum(0, yy2 - yy1)
-                inter = w * h
-                area1 = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
-                area2 = (boxes[idxs[1:], 2] - boxes[idxs[1:], 0]) * (boxes[idxs[1:], 3] - boxes[idxs[1:], 1])
-                ovr = inter / (area1 + area2 - inter)
-                idxs = idxs[1:][ovr < iou_threshold]
-            return keep
-        
-        keep_idx = nms(boxes, scores, nms_thresh)
-        boxes = boxes[keep_idx].tolist()
-        labels = labels[keep_idx].tolist()
-        scores = scores[keep_idx].tolist()
-        return {"boxes": boxes, "labels": labels, "scores": scores}
+    # Two preallocated batch tensors: batch N+1 is written into one while batch N runs on the other.
+    # They only grow, to the largest batch seen, and are sliced to each batch, so callers whose
+    # batch size changes on every call (e.g. the number of cameras due) don't reallocate them.
+    buffers = getattr(nanodet_buffers, "pair", None)
+    if (buffers is None or buffers[0].shape[1:] != (3, INPUT_SIZE, INPUT_SIZE)
+            or buffers[0].shape[0] < min(batch_size, len(image_paths))):
+        capacity = max(min(batch_size, len(image_paths)), buffers[0].shape[0] if buffers is not None else 0)
+        shape = (capacity, 3, INPUT_SIZE, INPUT_SIZE)
+        buffers = nanodet_buffers.pair = [np.empty(shape, dtype=np.float32) for _ in range(2)]
+    pool = get_preprocess_pool(workers) if workers != 0 else None
+
+    def preprocess_batch(image_paths_batch, buffer):
+        """Start preprocessing a batch into `buffer`; returns the pending transforms to wait on."""
+        if pool is None:
+            return [preprocess_nanodet_into(img, buffer[j], INPUT_SIZE, letterbox)
+                    for j, img in enumerate(image_paths_batch)]
+        return [pool.submit(preprocess_nanodet_into, img, buffer[j], INPUT_SIZE, letterbox)
+                for j, img in enumerate(image_paths_batch)]
     
     # Process images in batches
     all_results = []
-    for i in range(0, len(image_paths), batch_size):
+    starts = range(0, len(image_paths), batch_size)
+    pending = preprocess_batch(image_paths[:batch_size], buffers[0])
+    for n, i in enumerate(starts):
         batch_paths = image_paths[i:i + batch_size]
-        batch_imgs = preprocess_batch(batch_paths)
+        transforms = [t if isinstance(t, tuple) else t.result() for t in pending]
+        batch_imgs = buffers[n % 2][:len(batch_paths)]
+        if i + batch_size < len(image_paths):
+            pending = preprocess_batch(image_paths[i + batch_size:i + 2 * batch_size], buffers[(n + 1) % 2])
         
         # Run inference
         outputs = session.run(None, {input_name: batch_imgs})
         outputs = outputs[0] if isinstance(outputs, (list, tuple)) else outputs
         
-        # Postprocess each image in the batch
-        for j in range(len(batch_paths)):
-            if j < outputs.shape[0]:
-                result = postprocess_single(outputs[j], center_priors, score_thresh, nms_thresh)
-            else:
-                result = {"boxes": [], "labels": [], "scores": []}
-            all_results.append(result)
+        # Decode the whole batch at once, then map all boxes back to image coordinates
+        count = min(len(batch_paths), outputs.shape[0])
+        boxes, labels, scores, image_index = postprocess(outputs[:count], score_thresh, nms_thresh)
+        boxes = letterbox_to_original(boxes, np.array(transforms, dtype=np.float32)[image_index])
+        splits = np.cumsum(np.bincount(image_index, minlength=count))[:-1]
+        for image_boxes, image_labels, image_scores in zip(np.split(boxes, splits), np.split(labels, splits),
+                                                           np.split(scores, splits)):
+            all_results.append({"boxes": image_boxes.tolist(), "labels": image_labels.tolist(),
+                                "scores": image_scores.tolist()})
+        all_results.extend({"boxes": [], "labels": [], "scores": []} for _ in range(len(batch_paths) - count))
     
     return all_results
 
-def load_mobilenet_model():
+def open_camera(item, timeout=10):
     """
-    Load the MobileNet-SSD model.
-    
-    Returns:
-        cv2.dnn_Net: The loaded model.
+    Open one camera entry of data.json. Returns the capture, or None if it can't be opened.
+    Network streams give up after `timeout` seconds when opening or reading (FFmpeg's own
+    default is 30 s), so a host that went silent can't block the caller for long.
     """
-    prototxt_path = "MobileNetSSD_deploy.prototxt"
-    model_path = "MobileNetSSD_deploy.caffemodel"
-    net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-    return net
-
-
-net = load_mobilenet_model()
+    link = item.get('link', None)
+    if isinstance(link, str) and link.isdigit():
+        link = int(link)
+        cap = cv2.VideoCapture(link)
+    else:
+        timeout_ms = int(timeout * 1000)
+        cap = cv2.VideoCapture(link, cv2.CAP_FFMPEG,
+                               [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms])
+
+    if cap.isOpened():
+        width = item.get('width', None)
+        height = item.get('height', None)
+        if width and height:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return cap
+    print(f"Unable to open camera {item['link']}")
+    return None
 
 
 def initialize_cameras(config_file):
@@ -289,57 +269,63 @@ def initialize_cameras(config_file):
     caps = []
     cams = []
     with open(config_file, 'r') as file:
-        data = load(file)
-        for item in data:
-            link = item.get('link', None)
-            if isinstance(link, str) and link.isdigit():
-                link = int(link)
-                cap = cv2.VideoCapture(link)
-            else:
-                cap = cv2.VideoCapture(link, cv2.CAP_FFMPEG)
-                
-
-            if cap.isOpened():
-                width = item.get('width', None)
-                height = item.get('height', None)
-                if width and height:
-                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-                caps.append(cap)
-                cams.append(item)
-            else:
-                print(f"Unable to open camera {item['link']}")
+        data, _ = parse_config(load(file))
+    for item in data:
+        cap = open_camera(item)
+        if cap is not None:
+            caps.append(cap)
+            cams.append(item)
     return caps, cams
 
 
-def send_whatsapp_alert(timestamp, camera_info, frame):
+def send_whatsapp_alert(timestamp, camera_info, frame, phone_nums=None):
     """Send a WhatsApp alert for trespassing."""
-    phone_num = os.getenv('PHONE_NUM')
+    return not whatsapp_alert_failures(timestamp, camera_info, frame, phone_nums)
+
+
+def whatsapp_alert_failures(timestamp, camera_info, frame, phone_nums=None):
+    """Send a WhatsApp alert for trespassing; returns the numbers it could not be delivered to."""
+    if phone_nums is None:
+        phone_nums = [os.getenv('PHONE_NUM')]
     message = (f"A human trespassing event was detected at {timestamp}. "
                f"Camera Info: Name: {camera_info.get('name', 'Cam Undefined')}, "
                 f"Description: {camera_info.get('desc', 'No description')}, "
                 f"Link: {camera_info.get('link', 'no link')}."
                 f"An email has also been sent with the captured picture.")
+    from whatnot import send_whatsapp_message
+
     temp_image_path = "temp_image_for_whatsapp.jpg"
     cv2.imwrite(temp_image_path, frame)
     try:
         # kit.sendwhatmsg_instantly(phone_num, message, tab_close=True)
         # kit.sendwhats_image(phone_num, temp_image_path, message, tab_close=True)
-        send_whatsapp_message([phone_num], message)
+        statuses = send_whatsapp_message(phone_nums, message)
+        failed = {num: status for num, status in statuses.items() if status != "sent"}
+        if failed:
+            print(f"WhatsApp alert at {timestamp} not delivered to:", failed)
+            return list(failed)
         print(f"WhatsApp alert sent at {timestamp}.")
-        return True
+        return []
     except Exception as e:
         print("Failed to send WhatsApp alert:", e)
-        return False
+        return list(phone_nums)
     finally:
         if os.path.exists(temp_image_path):
             os.remove(temp_image_path)
     
     
-def send_email_alert(timestamp, camera_info, frame):
+def send_email_alert(timestamp, camera_info, frame, receiver_emails=None):
     """Send an email alert for trespassing."""
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.base import MIMEBase
+    from email import encoders
+
     sender_email = os.getenv('SENDER_EMAIL')
-    receiver_email = os.getenv('RECEIVER_EMAIL')
+    if receiver_emails is None:
+        receiver_emails = [os.getenv('RECEIVER_EMAIL')]
+    receiver_email = ", ".join(receiver_emails)
     email_password = os.getenv("SENDER_PASS")
     smtp_server = "smtp.gmail.com"
     smtp_port = 587
@@ -375,7 +361,7 @@ def send_email_alert(timestamp, camera_info, frame):
         server = smtplib.SMTP(smtp_server, smtp_port)
         server.starttls()
         server.login(sender_email, email_password)
-        server.sendmail(sender_email, [receiver_email], msg.as_string())
+        server.sendmail(sender_email, receiver_emails, msg.as_string())
         server.quit()
         print(f"Alert email sent at {timestamp}.")
         return True
@@ -416,60 +402,114 @@ def arrange_frames(frames, frame_size=(320, 240), cams=[]):
 
     return blank_image
 
-def detect_motion(backSub, kernel, frame, last_motion_ats, idx):
-    """Detect motion in a frame."""
-    fgMask = backSub.apply(frame)
-    fgMask = cv2.morphologyEx(fgMask, cv2.MORPH_OPEN, kernel)
-    contours, _ = cv2.findContours(fgMask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    for contour in contours:
-        if 1000 < cv2.contourArea(contour) < 10000:
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = h / float(w)
-            if aspect_ratio > 1.2:
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                last_motion_ats[idx] = time.time()
-                return True
-    return False
-
-def detect_human(frame, confidence_threshold=0.5):
-    """Detect humans in a frame using YOLO model."""
-    return detect_human_with_mobilenet(frame, net, confidence_threshold)
-
-
-def detect_human_with_mobilenet(frame, net, confidence_threshold=0.5):
+def frame_changed(frame, thumbnails, idx, thumb_size=(64, 48), pixel_threshold=15, min_changed=0.002):
     """
-    Detect humans in a frame using MobileNet-SSD.
-    
-    Args:
-        frame (numpy.ndarray): The input frame.
-        net (cv2.dnn_Net): The preloaded MobileNet-SSD model.
-        confidence_threshold (float): Minimum confidence to consider a detection valid.
-    
-    Returns:
-        bool: True if a human is detected, False otherwise.
+    Cheap first motion stage: compare a tiny grayscale thumbnail with the previous one.
+
+    Returns True if more than `min_changed` of the thumbnail pixels moved by more than
+    `pixel_threshold` grey levels (or there is no previous thumbnail yet).
+    `thumbnails[idx]` is updated with the current thumbnail.
     """
-    # Preprocess the frame for the model
-    blob = cv2.dnn.blobFromImage(frame, 0.007843, (300, 300), 127.5)
-    net.setInput(blob)
-    detections = net.forward()
-
-    # Loop through detections
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > confidence_threshold:
-            class_id = int(detections[0, 0, i, 1])
-            # Class ID 15 corresponds to 'person' in MobileNet-SSD
-            if class_id == 15:
-                box = detections[0, 0, i, 3:7] * np.array([frame.shape[1], frame.shape[0], frame.shape[1], frame.shape[0]])
-                (x1, y1, x2, y2) = box.astype("int")
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                label = f"Person: {confidence:.2f}"
-                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                return True
-    return False
-
-
-# Shutdown the email worker thread gracefully (call this when the program exits)
-def shutdown_email_worker():
-    email_queue.put(None)  # Send exit signal
-    email_thread.join()
\ No newline at end of file
+    small = cv2.resize(frame, thumb_size, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    previous = thumbnails[idx]
+    thumbnails[idx] = gray
+    if previous is None or previous.shape != gray.shape:
+        return True
+    diff = cv2.absdiff(gray, previous)
+    _, diff = cv2.threshold(diff, pixel_threshold, 255, cv2.THRESH_BINARY)
+    return cv2.countNonZero(diff) > min_changed * gray.size
+
+
+def compile_zone_mask(camera_info, shape):
+    """
+    Build the motion zone mask of a camera for frames of `shape`.
+
+    Zones come from the "include_zones" / "exclude_zones" keys of data.json: lists of
+    polygons with points in normalized [0, 1] (x, y) coordinates. Motion counts only
+    inside the include polygons (the whole frame if there are none) and never inside
+    the exclude polygons. Returns None when the camera has no zones.
+    """
+    include = camera_info.get('include_zones') or []
+    exclude = camera_info.get('exclude_zones') or []
+    if not include and not exclude:
+        return None
+
+    h, w = shape[:2]
+    scale = np.array([w, h], dtype=np.float32)
+
+    def to_pixels(polygon):
+        return np.round(np.array(polygon, dtype=np.float32) * scale).astype(np.int32)
+
+    if include:
+        mask = np.zeros((h, w), dtype=np.uint8)
+        # One polygon per call: a single fillPoly fills overlaps with even-odd parity
+        for polygon in include:
+            cv2.fillPoly(mask, [to_pixels(polygon)], 255)
+    else:
+        mask = np.full((h, w), 255, dtype=np.uint8)
+    for polygon in exclude:
+        cv2.fillPoly(mask, [to_pixels(polygon)], 0)
+    return mask
+
+
+def motion_boxes(fgMask, min_area=1000, max_area=10000, min_aspect_ratio=1.2):
+    """
+    All person-shaped blobs of a foreground mask in one pass.
+
+    Returns an (N, 4) int array of (x, y, w, h) boxes whose pixel area lies in
+    (min_area, max_area) and whose h / w is above min_aspect_ratio.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(fgMask, connectivity=8)
+    stats = stats[1:]  # label 0 is the background
+    area = stats[:, cv2.CC_STAT_AREA]
+    w = stats[:, cv2.CC_STAT_WIDTH]
+    h = stats[:, cv2.CC_STAT_HEIGHT]
+    keep = (area > min_area) & (area < max_area) & (h > min_aspect_ratio * w)
+    return stats[keep, :4]
+
+
+def detect_motion(backSub, kernel, frame, last_motion_ats, idx, zone_mask=None, learning_rate=-1, min_area=1000):
+    """
+    Detect motion in a frame, ignoring foreground outside `zone_mask` if given.
+
+    Returns the (N, 4) array of moving-object boxes (x, y, w, h); empty if there is no motion.
+    The frame is left untouched, it is the one handed to the person detector.
+    """
+    fgMask = backSub.apply(frame, learningRate=learning_rate)
+    if zone_mask is not None:
+        cv2.bitwise_and(fgMask, zone_mask, dst=fgMask)
+    fgMask = cv2.morphologyEx(fgMask, cv2.MORPH_OPEN, kernel)
+    boxes = motion_boxes(fgMask, min_area=min_area)
+    if len(boxes):
+        last_motion_ats[idx] = time.time()
+    return boxes
+
+def draw_person_boxes(frame, detections):
+    """Draw (x1, y1, x2, y2, score) person detections onto a frame."""
+    for x1, y1, x2, y2, confidence in detections:
+        (x1, y1, x2, y2) = int(x1), int(y1), int(x2), int(y2)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        label = f"Person: {confidence:.2f}"
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return frame
+
+
+def shutdown_whatsapp_sessions():
+    """Quit the warm WhatsApp drivers, if WhatsApp was used at all."""
+    whatnot = sys.modules.get('whatnot')
+    if whatnot is not None:
+        whatnot.close_sessions()
+
+
+# Stop the alert workers gracefully (call this when the program exits). Alerts that
+# are due get `drain_timeout` seconds to go out; anything unsent stays on disk.
+def shutdown_alert_workers(drain_timeout=10):
+    with alert_lock:
+        threads = list(alert_threads.items())
+    for channel, thread in threads:
+        alert_queue = alert_queues[channel]
+        if not alert_queue.join(drain_timeout):
+            print(f"{len(alert_queue)} {channel} alert(s) left in '{alert_queue.directory}' for the next run.")
+        alert_queue.close()
+        thread.join(drain_timeout)
@@ -1,5 +1,9 @@
-import os, time, pickle
+import os, pickle, queue, threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -7,6 +11,15 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium_stealth import stealth
 
 COOKIES_FILE = "whatsapp_cookies.pkl"
+WHATSAPP_URL = "https://web.whatsapp.com"
+
+# XPaths of the WhatsApp Web UI
+CHATS_XPATH = "//button[@aria-label='Chats']"
+LOGIN_XPATH = "//div[contains(text(),'Log in with phone number')] | //div[@data-link-code] | //canvas[@aria-label]"
+SEND_XPATH = "//button[@aria-label='Send']"
+VOICE_XPATH = "//button[@aria-label='Voice message']"  # replaces Send once the compose box is empty
+OUTGOING_XPATH = "//div[contains(@class,'message-out')]"
+LAST_PENDING_XPATH = f"({OUTGOING_XPATH})[last()]//span[@data-icon='msg-time']"
 
 def make_driver(headless=True, profile_dir="whatsapp-profile"):
     options = Options()
@@ -40,14 +53,15 @@ def set_react_value(driver, element, value):
     """
     driver.execute_script(js, element, value)
 
-def login_and_save_session(phone_number: str, headless=True):
+def login_and_save_session(phone_number: str, headless=True, profile_dir="whatsapp-profile"):
     """
     1) Opens WhatsApp Web
     2) Clicks “Log in with phone number”
     3) Waits until chats UI loads (user enters code on phone)
     4) Saves cookies to COOKIES_FILE
+    Every driver profile of the session pool is a separate linked device and needs its own login.
     """
-    driver = make_driver(headless)
+    driver = make_driver(headless, profile_dir)
     driver.get("https://web.whatsapp.com")
 
     # click “Log in with phone number”
@@ -83,51 +97,206 @@ def login_and_save_session(phone_number: str, headless=True):
         pickle.dump(driver.get_cookies(), f)
     driver.quit()
 
-def send_whatsapp_message(phone_numbers: list, message: str, headless=True):
+class WhatsAppSessionManager:
     """
-    1) Loads cookies from COOKIES_FILE into a headless driver
-    2) Opens WhatsApp Web (already logged in)
-    3) Opens chat for phone_number and sends `message`
+    Pool of warm, logged-in WhatsApp Web drivers.
+
+    Drivers are started and logged in once, then reused for every alert. Before a driver
+    is handed out its health is checked in place (no page reload): the browser must
+    answer and the chat list must be on screen. The login is only renewed (cookies
+    re-applied, one reload) when that check fails, and a dead browser is replaced.
+    Each driver gets its own Chrome profile directory since Chrome locks a profile
+    to a single process.
     """
-    
-    if not os.path.exists(COOKIES_FILE):
-        raise RuntimeError("No session cookies found. Run login_and_save_session() first.")
 
-    driver = make_driver(headless)
-    driver.get("https://web.whatsapp.com")
+    def __init__(self, pool_size=1, headless=True, profile_dir="whatsapp-profile"):
+        self.pool_size = pool_size
+        self.headless = headless
+        self.profile_dir = profile_dir
+        self.pool = queue.Queue()
+        self.drivers = []
+        self.lock = threading.Lock()
 
-    try:
-        continue_btn = WebDriverWait(driver, 30).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//div[text()='Continue']]"))
-        )
-        continue_btn.click()
-        time.sleep(3)
-    except Exception as e:
-        pass
-
-    # load cookies & refresh
-    with open(COOKIES_FILE, "rb") as f:
-        cookies = pickle.load(f)
-        print(f"Loading cookies: {cookies}")
-    for c in cookies:
-        driver.add_cookie(c)
-    # driver.refresh()
-
-    # open chat and send
-    for phone_number in phone_numbers:
-        chat_url = f"https://web.whatsapp.com/send?phone={phone_number}&text={message}"
-        driver.get(chat_url)
-        # wait for send button
-        send_btn = WebDriverWait(driver, 30).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Send']"))
-        )
-        send_btn.click()
-        WebDriverWait(driver, 60).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Voice message']"))
-        )
-        print(f"📨 Sent to {phone_number}: {message}")
-
-
-    time.sleep(5)
-    driver.quit()
+    def _profile(self, slot):
+        return self.profile_dir if slot == 0 else f"{self.profile_dir}-{slot}"
+
+    def _start_driver(self, slot):
+        if not os.path.exists(COOKIES_FILE):
+            raise RuntimeError("No session cookies found. Run login_and_save_session() first.")
+        driver = make_driver(self.headless, self._profile(slot))
+        driver.slot = slot
+        driver.get(WHATSAPP_URL)
+        self._apply_cookies(driver)
+        if not self._wait_logged_in(driver):
+            # Never pool a profile that isn't logged in: every borrow would fail on it
+            driver.quit()
+            raise RuntimeError(f"WhatsApp profile '{self._profile(slot)}' is not logged in. "
+                               "Run login_and_save_session() for it again.")
+        return driver
+
+    def _apply_cookies(self, driver):
+        with open(COOKIES_FILE, "rb") as f:
+            cookies = pickle.load(f)
+        for c in cookies:
+            driver.add_cookie(c)
+
+    def _wait_logged_in(self, driver, timeout=60):
+        """Wait until either the chat list or a login prompt shows up; the chat list means success."""
+        try:
+            # Dismiss the optional "Continue" interstitial if it shows up
+            for btn in driver.find_elements(By.XPATH, "//button[.//div[text()='Continue']]"):
+                btn.click()
+            WebDriverWait(driver, timeout).until(
+                EC.any_of(EC.presence_of_element_located((By.XPATH, CHATS_XPATH)),
+                          EC.presence_of_element_located((By.XPATH, LOGIN_XPATH)))
+            )
+        except TimeoutException:
+            return False
+        return bool(driver.find_elements(By.XPATH, CHATS_XPATH))
+
+    def is_healthy(self, driver):
+        """Cheap in-place check: the browser answers and the chat list is present."""
+        try:
+            return bool(driver.find_elements(By.XPATH, CHATS_XPATH))
+        except WebDriverException:
+            return False
+
+    def _renew(self, driver):
+        """Bring a driver back to a logged-in state, replacing it if the browser is gone."""
+        try:
+            driver.execute_script("return 1")
+        except WebDriverException:
+            return self._replace(driver)
+        self._apply_cookies(driver)
+        driver.get(WHATSAPP_URL)
+        if not self._wait_logged_in(driver):
+            raise RuntimeError("WhatsApp Web session expired. Run login_and_save_session() again.")
+        return driver
+
+    def _discard(self, driver):
+        """Quit a driver and drop it from the pool; the next borrow starts a replacement."""
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+        with self.lock:
+            if driver in self.drivers:
+                self.drivers.remove(driver)
+
+    def _replace(self, driver):
+        self._discard(driver)
+        new_driver = self._start_driver(driver.slot)
+        with self.lock:
+            self.drivers.append(new_driver)
+        return new_driver
+
+    def start(self):
+        """Start and log in the whole pool up front (or the drivers missing from it)."""
+        with self.lock:
+            while len(self.drivers) < self.pool_size:
+                used = {driver.slot for driver in self.drivers}
+                slot = min(set(range(self.pool_size)) - used)
+                driver = self._start_driver(slot)
+                self.drivers.append(driver)
+                self.pool.put(driver)
+
+    @contextmanager
+    def driver(self, timeout=120):
+        """Borrow a healthy driver from the pool."""
+        if len(self.drivers) < self.pool_size:
+            try:
+                self.start()
+            except Exception as e:
+                if not self.drivers:
+                    raise
+                print("Could not start a WhatsApp driver, using the remaining ones:", e)
+        driver = self.pool.get(timeout=timeout)
+        try:
+            if not self.is_healthy(driver):
+                driver = self._renew(driver)
+        except Exception:
+            # Never hand a driver that couldn't be renewed back to the pool
+            self._discard(driver)
+            raise
+        try:
+            yield driver
+        finally:
+            self.pool.put(driver)
+
+    def close(self):
+        with self.lock:
+            for driver in self.drivers:
+                try:
+                    driver.quit()
+                except WebDriverException:
+                    pass
+            self.drivers = []
+            self.pool = queue.Queue()
+
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager(headless=True):
+    """Shared session manager, created on first use. WHATSAPP_DRIVERS sets the pool size (default 1)."""
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            pool_size = int(os.getenv("WHATSAPP_DRIVERS", 1))
+            _session_manager = WhatsAppSessionManager(pool_size=pool_size, headless=headless)
+        return _session_manager
+
+
+def close_sessions():
+    """Quit the warm drivers (call this when the program exits)."""
+    if _session_manager is not None:
+        _session_manager.close()
+
+
+def send_to_chat(driver, phone_number, message, timeout=30):
+    """Open the chat with `phone_number` prefilled with `message`, send it and wait until it left the outbox."""
+    driver.get(f"{WHATSAPP_URL}/send?phone={quote(str(phone_number))}&text={quote(message)}")
+    send_btn = WebDriverWait(driver, timeout).until(
+        EC.element_to_be_clickable((By.XPATH, SEND_XPATH))
+    )
+    sent_before = len(driver.find_elements(By.XPATH, OUTGOING_XPATH))
+    send_btn.click()
+    # The new bubble must be on screen (and the compose box cleared) before its clock icon
+    # means anything: right after the click there is no clock yet
+    WebDriverWait(driver, timeout).until(
+        lambda d: len(d.find_elements(By.XPATH, OUTGOING_XPATH)) > sent_before
+        and d.find_elements(By.XPATH, VOICE_XPATH)
+    )
+    # The clock icon of that bubble disappears once the server accepted the message
+    WebDriverWait(driver, timeout).until(
+        EC.invisibility_of_element_located((By.XPATH, LAST_PENDING_XPATH))
+    )
+
+
+def send_whatsapp_message(phone_numbers: list, message: str, headless=True, timeout=30, retries=1):
+    """
+    Delivers `message` to every recipient in parallel, one recipient per pooled driver
+    (WhatsApp Web allows a single active tab per linked device, so parallelism comes
+    from the drivers, not from tabs). Each recipient gets `timeout` seconds per attempt
+    and `retries` extra attempts.
+    Returns {phone_number: "sent" | "failed: <reason>"}.
+    """
+    manager = get_session_manager(headless)
+
+    def deliver(phone_number):
+        error = None
+        for attempt in range(retries + 1):
+            try:
+                with manager.driver() as driver:
+                    send_to_chat(driver, phone_number, message, timeout)
+                print(f"📨 Sent to {phone_number}")
+                return phone_number, "sent"
+            except Exception as e:
+                error = e
+                print(f"Attempt {attempt + 1} to {phone_number} failed: {e}")
+        return phone_number, f"failed: {error}"
 
+    workers = max(1, min(manager.pool_size, len(phone_numbers)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(deliver, phone_numbers))